@@ -0,0 +1,126 @@
+import hashlib
+import os
+import threading
+import time
+
+_EXTENSIONS = {'image/jpeg': 'jpg', 'image/png': 'png'}
+_MIME_TYPES = {ext: mime for mime, ext in _EXTENSIONS.items()}
+
+
+class AlbumArtCache:
+    """
+    On-disk cache of processed cover art.
+    Processed images are stored once per source-image content hash (many tracks from one channel
+    or album share art), and a small per-URL index lets repeat URLs skip the network entirely.
+    Both keys include the processing variant (e.g. the max cover size) so changing it doesn't serve stale art.
+    Reading an image refreshes its modification time, so prune() drops the least recently used images first.
+    """
+
+    def __init__(self, cache_dir: str, max_age_days: float = 90, max_bytes: int = 200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self._blob_dir = os.path.join(cache_dir, "blobs")
+        self._url_dir = os.path.join(cache_dir, "urls")
+        os.makedirs(self._blob_dir, exist_ok=True)
+        os.makedirs(self._url_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hash(*parts) -> str:
+        return hashlib.sha256("\x1f".join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def content_key(image_data: bytes, variant: str) -> str:
+        return AlbumArtCache._hash(hashlib.sha256(image_data).hexdigest(), variant)
+
+    def get_by_url(self, url: str, variant: str) -> tuple[bytes, str] | None:
+        try:
+            with open(os.path.join(self._url_dir, self._hash(url, variant)), encoding='utf-8') as f:
+                blob_name = f.read().strip()
+        except OSError:
+            self._count(hit=False)
+            return None
+        result = self._read_blob(blob_name)
+        self._count(hit=result is not None)
+        return result
+
+    def get_by_content(self, content_key: str) -> tuple[bytes, str] | None:
+        for ext in _MIME_TYPES:
+            result = self._read_blob(f"{content_key}.{ext}")
+            if result:
+                return result
+        return None
+
+    def put(self, url: str, variant: str, content_key: str, image_data: bytes, mime_type: str):
+        blob_name = f"{content_key}.{_EXTENSIONS.get(mime_type, 'jpg')}"
+        self._atomic_write(os.path.join(self._blob_dir, blob_name), image_data)
+        self._atomic_write(os.path.join(self._url_dir, self._hash(url, variant)), blob_name.encode('utf-8'))
+
+    def _read_blob(self, blob_name: str) -> tuple[bytes, str] | None:
+        ext = os.path.splitext(blob_name)[1].lstrip('.')
+        path = os.path.join(self._blob_dir, blob_name)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path) # Marks it as recently used for prune()
+        except OSError:
+            return None
+        return data, _MIME_TYPES.get(ext, 'image/jpeg')
+
+    def prune(self) -> int:
+        """
+        Deletes images not used within max_age_days, then the least recently used ones until the images
+        fit in max_bytes, and finally URL index entries whose image is gone. Returns the number of images removed.
+        """
+        cutoff = time.time() - self.max_age_days * 86400
+        blobs = []
+        for entry in os.scandir(self._blob_dir):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            blobs.append((stat.st_mtime, stat.st_size, entry.path))
+        blobs.sort()
+        total_bytes = sum(size for _, size, _ in blobs)
+        removed = 0
+        for mtime, size, path in blobs:
+            if mtime >= cutoff and total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_bytes -= size
+            removed += 1
+
+        for entry in os.scandir(self._url_dir):
+            try:
+                with open(entry.path, encoding='utf-8') as f:
+                    blob_name = f.read().strip()
+                if entry.name.endswith('.tmp') or not os.path.exists(os.path.join(self._blob_dir, blob_name)):
+                    os.remove(entry.path)
+            except OSError:
+                pass
+        return removed
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not write album art cache entry {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
@@ -0,0 +1,235 @@
+import base64
+import os
+
+import mutagen
+from mutagen.mp4 import MP4, MP4Cover, MP4FreeForm
+from mutagen.flac import FLAC, Picture
+from mutagen.id3 import ID3NoHeaderError, ID3, TIT2, TPE1, APIC, TXXX
+
+MP3_EXTENSIONS = ('.mp3',)
+MP4_EXTENSIONS = ('.m4a', '.mp4', '.m4b')
+VORBIS_EXTENSIONS = ('.opus', '.ogg', '.oga', '.flac')
+SUPPORTED_EXTENSIONS = MP3_EXTENSIONS + MP4_EXTENSIONS + VORBIS_EXTENSIONS
+
+# Where the YouTube source of a track is recorded, so the library can be re-indexed and re-tagged later.
+# Keys are the fields of the 'source' dict passed to write_tags.
+SOURCE_FIELDS = {
+    'video_id': 'YouTube Video ID',
+    'url': 'YouTube URL',
+    'title': 'YouTube Title',
+}
+_MP4_FREEFORM_PREFIX = '----:com.apple.iTunes:'
+
+
+def is_supported(file_path: str) -> bool:
+    return os.path.splitext(file_path)[1].lower() in SUPPORTED_EXTENSIONS
+
+
+def write_tags(file_path: str, title: str, artist: str, image_data: bytes = None, image_format: str = None,
+               source: dict = None):
+    """
+    Replaces the tags of an audio file with title, artist, optional front cover and optional
+    YouTube source fields. MP3 files get ID3v2.3 tags, M4A/MP4 files get MP4 atoms,
+    and Opus/Ogg/FLAC files get Vorbis comments.
+    Raises ValueError for unsupported file types.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    source = {k: v for k, v in (source or {}).items() if k in SOURCE_FIELDS and v}
+    if extension in MP3_EXTENSIONS:
+        _write_id3_tags(file_path, title, artist, image_data, image_format, source)
+    elif extension in MP4_EXTENSIONS:
+        _write_mp4_tags(file_path, title, artist, image_data, image_format, source)
+    elif extension in VORBIS_EXTENSIONS:
+        _write_vorbis_tags(file_path, title, artist, image_data, image_format, source)
+    else:
+        raise ValueError(f"Tagging '{extension}' files is not supported.")
+
+
+def update_tags(file_path: str, title: str = None, artist: str = None):
+    """
+    Changes only the given title and/or artist tags in place, keeping the cover art, source fields
+    and any other tags. Cheaper than write_tags for re-tagging: no image is re-encoded, and ID3 tags
+    usually fit in their existing padding, so the audio data isn't moved.
+    Raises ValueError for unsupported file types.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in MP3_EXTENSIONS:
+        try:
+            tags = ID3(file_path)
+        except ID3NoHeaderError:
+            tags = ID3()
+        if title is not None:
+            tags.setall('TIT2', [TIT2(encoding=3, text=[title])])
+        if artist is not None:
+            tags.setall('TPE1', [TPE1(encoding=3, text=[artist])])
+        tags.save(file_path, v2_version=3)
+    elif extension in MP4_EXTENSIONS:
+        audio = MP4(file_path)
+        if audio.tags is None:
+            audio.add_tags()
+        if title is not None:
+            audio.tags['\xa9nam'] = [title]
+        if artist is not None:
+            audio.tags['\xa9ART'] = [artist]
+        audio.save()
+    elif extension in VORBIS_EXTENSIONS:
+        audio = mutagen.File(file_path)
+        if audio is None:
+            raise ValueError(f"Unrecognized audio file: {file_path}")
+        if audio.tags is None:
+            audio.add_tags()
+        if title is not None:
+            audio.tags['title'] = [title]
+        if artist is not None:
+            audio.tags['artist'] = [artist]
+        audio.save()
+    else:
+        raise ValueError(f"Tagging '{extension}' files is not supported.")
+
+
+def read_tags(file_path: str) -> dict | None:
+    """
+    Reads the tags this tool writes. Returns {'title', 'artist', 'has_cover', 'source'} where
+    'source' holds any recorded YouTube fields, or None if the file can't be read.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    try:
+        if extension in MP3_EXTENSIONS:
+            return _read_id3_tags(file_path)
+        if extension in MP4_EXTENSIONS:
+            return _read_mp4_tags(file_path)
+        if extension in VORBIS_EXTENSIONS:
+            return _read_vorbis_tags(file_path)
+    except (mutagen.MutagenError, OSError, ValueError) as e:
+        print(f"Warning: Could not read tags from '{file_path}': {e}")
+    return None
+
+
+def _write_id3_tags(file_path, title, artist, image_data, image_format, source):
+    # Only the tag is read and replaced, and the file is written once whether or not it had a tag;
+    # parsing the MPEG stream or saving an empty tag first would just rewrite the file again
+    try:
+        tags = ID3(file_path)
+    except ID3NoHeaderError:
+        tags = ID3()
+
+    tags.clear()
+
+    tags.add(TIT2(encoding=3, text=[title])) # Title (TIT2)
+    tags.add(TPE1(encoding=3, text=[artist])) # Artist (TPE1)
+    for key, value in source.items():
+        tags.add(TXXX(encoding=3, desc=SOURCE_FIELDS[key], text=[value]))
+
+    if image_data:
+        tags.add(
+            APIC(
+                encoding=3,  # UTF-8
+                mime=image_format,  # image/jpeg or image/png
+                type=3,  # 3 is for Front Cover
+                desc='Cover',
+                data=image_data
+            )
+        )
+    tags.save(file_path, v2_version=3) # Save with ID3v2.3 for broader compatibility
+
+
+def _write_mp4_tags(file_path, title, artist, image_data, image_format, source):
+    audio = MP4(file_path)
+    if audio.tags is None:
+        audio.add_tags()
+    audio.tags.clear()
+
+    audio.tags['\xa9nam'] = [title] # Title
+    audio.tags['\xa9ART'] = [artist] # Artist
+    for key, value in source.items():
+        audio.tags[_MP4_FREEFORM_PREFIX + SOURCE_FIELDS[key]] = [MP4FreeForm(value.encode('utf-8'))]
+
+    if image_data:
+        cover_format = MP4Cover.FORMAT_PNG if image_format == 'image/png' else MP4Cover.FORMAT_JPEG
+        audio.tags['covr'] = [MP4Cover(image_data, imageformat=cover_format)]
+    audio.save()
+
+
+def _write_vorbis_tags(file_path, title, artist, image_data, image_format, source):
+    audio = mutagen.File(file_path)
+    if audio is None:
+        raise ValueError(f"Unrecognized audio file: {file_path}")
+    if audio.tags is None:
+        audio.add_tags()
+    audio.tags.clear()
+
+    audio.tags['title'] = [title]
+    audio.tags['artist'] = [artist]
+    for key, value in source.items():
+        audio.tags[_vorbis_key(key)] = [value]
+
+    if isinstance(audio, FLAC):
+        audio.clear_pictures()
+    if image_data:
+        picture = Picture()
+        picture.type = 3 # Front Cover
+        picture.mime = image_format
+        picture.desc = 'Cover'
+        picture.data = image_data
+        if isinstance(audio, FLAC):
+            audio.add_picture(picture)
+        else:
+            # Ogg containers carry pictures as a base64 FLAC picture block in a Vorbis comment
+            audio.tags['metadata_block_picture'] = [base64.b64encode(picture.write()).decode('ascii')]
+    audio.save()
+
+
+def _vorbis_key(field: str) -> str:
+    return SOURCE_FIELDS[field].lower().replace(' ', '_')
+
+
+def _read_id3_tags(file_path):
+    try:
+        tags = ID3(file_path)
+    except ID3NoHeaderError:
+        return {'title': None, 'artist': None, 'has_cover': False, 'source': {}}
+    source = {}
+    for key, desc in SOURCE_FIELDS.items():
+        frame = tags.get(f'TXXX:{desc}')
+        if frame and frame.text:
+            source[key] = str(frame.text[0])
+    return {
+        'title': str(tags['TIT2'].text[0]) if 'TIT2' in tags and tags['TIT2'].text else None,
+        'artist': str(tags['TPE1'].text[0]) if 'TPE1' in tags and tags['TPE1'].text else None,
+        'has_cover': bool(tags.getall('APIC')),
+        'source': source,
+    }
+
+
+def _read_mp4_tags(file_path):
+    tags = MP4(file_path).tags or {}
+    source = {}
+    for key, desc in SOURCE_FIELDS.items():
+        values = tags.get(_MP4_FREEFORM_PREFIX + desc)
+        if values:
+            source[key] = bytes(values[0]).decode('utf-8', errors='replace')
+    return {
+        'title': tags['\xa9nam'][0] if tags.get('\xa9nam') else None,
+        'artist': tags['\xa9ART'][0] if tags.get('\xa9ART') else None,
+        'has_cover': bool(tags.get('covr')),
+        'source': source,
+    }
+
+
+def _read_vorbis_tags(file_path):
+    audio = mutagen.File(file_path)
+    if audio is None:
+        raise ValueError(f"Unrecognized audio file: {file_path}")
+    tags = audio.tags or {}
+    source = {}
+    for key in SOURCE_FIELDS:
+        values = tags.get(_vorbis_key(key))
+        if values:
+            source[key] = values[0]
+    has_cover = bool(getattr(audio, 'pictures', None)) or bool(tags.get('metadata_block_picture'))
+    return {
+        'title': tags['title'][0] if tags.get('title') else None,
+        'artist': tags['artist'][0] if tags.get('artist') else None,
+        'has_cover': has_cover,
+        'source': source,
+    }
@@ -0,0 +1,66 @@
+"""
+Measures the rule-based title parser against the labeled corpus in title_corpus.jsonl.
+
+Reports how many titles clear the confidence threshold (LLM calls avoided) and how accurate
+those fast-path answers are. Run from the repository root:
+
+    python benchmarks/evaluate_title_parser.py [--threshold 0.85] [--verbose]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from title_parser import TitleParser
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "title_corpus.jsonl")
+
+
+def load_corpus(path: str) -> list[dict]:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def matches(parsed: dict, expected: dict) -> bool:
+    return (parsed['title'].casefold() == expected['title'].casefold()
+            and parsed['artist'].casefold() == expected['artist'].casefold())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the rule-based title parser against a labeled corpus.")
+    parser.add_argument("--corpus", default=CORPUS_PATH, help="Path to a JSONL corpus of labeled titles.")
+    parser.add_argument("--threshold", type=float, default=Config().title_parser_threshold,
+                        help="Confidence needed to skip the LLM.")
+    parser.add_argument("--verbose", action='store_true', help="Print every title that is wrong or sent to the LLM.")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    title_parser = TitleParser()
+
+    accepted = correct_accepted = correct_total = 0
+    for item in corpus:
+        parsed = title_parser.parse(item['youtube_title'], item.get('uploader'))
+        is_correct = matches(parsed, item)
+        correct_total += is_correct
+        if parsed['confidence'] >= args.threshold:
+            accepted += 1
+            correct_accepted += is_correct
+            if args.verbose and not is_correct:
+                print(f"WRONG  ({parsed['confidence']:.2f}) {item['youtube_title']!r} -> {parsed['artist']!r} / {parsed['title']!r}")
+        elif args.verbose:
+            print(f"LLM    ({parsed['confidence']:.2f}) {item['youtube_title']!r} -> {parsed['artist']!r} / {parsed['title']!r}")
+
+    total = len(corpus)
+    print(f"Titles:                 {total}")
+    print(f"Threshold:              {args.threshold:.2f}")
+    print(f"LLM calls avoided:      {accepted}/{total} ({accepted / total:.0%})")
+    if accepted:
+        print(f"Fast-path accuracy:     {correct_accepted}/{accepted} ({correct_accepted / accepted:.0%})")
+    print(f"Parser accuracy (all):  {correct_total}/{total} ({correct_total / total:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""
+Runs the whole Orchestrator pipeline offline against local stand-ins and reports how fast it goes.
+
+Every network dependency is replaced by a local fake:
+- a yt-dlp extractor for https://www.youtube.com/watch?v=benchNNNNNN URLs (and a playlist of them)
+  whose audio is a generated WAV file, so the download and the ffmpeg transcode are real
+- a fake OpenAI/Anthropic/Gemini endpoint with configurable latency, reached through
+  OPENAI_BASE_URL, ANTHROPIC_BASE_URL and GEMINI_BASE_URL
+- a thumbnail server returning generated JPEGs
+
+Two scenarios are measured, each in its own process with fresh caches and output directory:
+'single' runs the tracks one at a time, and 'batch' runs them as one playlist through the worker pool.
+For each it reports throughput, p50/p95 per-track latency, per-stage medians and peak RSS.
+Requires ffmpeg. Run from the repository root:
+
+    python benchmarks/pipeline_bench.py [--tracks 20] [--llm_provider openai] [--llm_latency 0.5] [--mode both]
+"""
+import argparse
+import json
+import math
+import os
+import re
+import resource
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_ARTISTS = ("Nova Vale", "The Paper Kites", "DJ Koto", "Mira Sol", "Lowland Echo", "Ash & Ivory")
+_SONGS = ("Midnight Drive", "Glass Hearts", "Lantern", "Undertow", "Golden Hour", "Static Bloom", "Paper Moon",
+          "Northbound")
+# A mix of titles the rule-based parser resolves on its own and titles that need the LLM
+_TITLE_TEMPLATES = (
+    "{artist} - {song} (Official Video)",
+    "{artist} - {song} [Official Audio]",
+    "{song} | {artist} live session",
+    "{song} (lyrics) {artist}",
+    "{artist} \"{song}\" HD",
+)
+_SAMPLE_RATE = 44100
+_THUMBNAIL_SIZE = (1280, 720)
+
+
+def video_id(index: int) -> str:
+    return f"bench{index:06d}" # 11 characters, like a real YouTube video ID
+
+
+def watch_url(index: int) -> str:
+    return f"https://www.youtube.com/watch?v={video_id(index)}"
+
+
+def playlist_url(track_count: int) -> str:
+    return f"https://www.youtube.com/playlist?list=bench{track_count}"
+
+
+def track_title(index: int) -> str:
+    artist = _ARTISTS[(index // len(_SONGS)) % len(_ARTISTS)]
+    song = _SONGS[index % len(_SONGS)]
+    repeat = index // (len(_SONGS) * len(_ARTISTS))
+    if repeat:
+        song = f"{song} Pt. {repeat + 1}"
+    return _TITLE_TEMPLATES[index % len(_TITLE_TEMPLATES)].format(artist=artist, song=song)
+
+
+def generate_wav(seconds: float) -> bytes:
+    """
+    A mono 16-bit 440 Hz sine tone, built from one repeated second.
+    """
+    second = struct.pack(f"<{_SAMPLE_RATE}h", *(
+        int(12000 * math.sin(2 * math.pi * 440 * i / _SAMPLE_RATE)) for i in range(_SAMPLE_RATE)
+    ))
+    samples = second * int(seconds) + second[:2 * int(_SAMPLE_RATE * (seconds % 1))]
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + len(samples), b"WAVE", b"fmt ", 16, 1, 1,
+        _SAMPLE_RATE, _SAMPLE_RATE * 2, 2, 16, b"data", len(samples)
+    )
+    return header + samples
+
+
+def generate_thumbnail(video_id: str) -> bytes:
+    """
+    A noisy 1280x720 JPEG tinted per video, so every track has distinct artwork of realistic size.
+    """
+    from PIL import Image
+    shade = zlib.crc32(video_id.encode()) & 0xff
+    noise = Image.effect_noise(_THUMBNAIL_SIZE, 64)
+    image = Image.merge('RGB', (noise, Image.new('L', _THUMBNAIL_SIZE, shade), noise))
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def fake_metadata(youtube_title: str) -> dict:
+    cleaned = re.sub(r"\s*[\(\[][^\)\]]*[\)\]]", "", youtube_title).strip()
+    if " - " in cleaned:
+        artist, title = cleaned.split(" - ", 1)
+        return {'title': title.strip(), 'artist': artist.strip()}
+    return {'title': cleaned, 'artist': 'Unknown'}
+
+
+def fake_llm_answer(prompt: str) -> str:
+    """
+    Answers the single-title and batched prompts MetadataProcessor sends, in the JSON shape it expects.
+    """
+    request = prompt[prompt.rfind("Input:") + len("Input:"):]
+    if request.startswith("\n"):
+        results = []
+        for line in request.strip().splitlines():
+            match = re.match(r"(\d+): (.*)$", line)
+            if match:
+                results.append({'index': int(match.group(1)), **fake_metadata(json.loads(match.group(2)))})
+        return json.dumps({'results': results})
+    return json.dumps(fake_metadata(request.strip().strip("'")))
+
+
+class BenchServer(ThreadingHTTPServer):
+    """
+    Serves generated audio, generated thumbnails and fake LLM completions from one local port.
+    """
+    daemon_threads = True
+
+    def __init__(self, audio: bytes, llm_latency: float, thumbnail_latency: float):
+        super().__init__(('127.0.0.1', 0), _BenchHandler)
+        self.audio = audio
+        self.llm_latency = llm_latency
+        self.thumbnail_latency = thumbnail_latency
+        self._thumbnails = {}
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def thumbnail(self, video_id: str) -> bytes:
+        with self._lock:
+            if video_id not in self._thumbnails:
+                self._thumbnails[video_id] = generate_thumbnail(video_id)
+            return self._thumbnails[video_id]
+
+
+class _BenchHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        match = re.fullmatch(r"/(audio|thumb)/(\w+)\.(wav|jpg)", self.path)
+        if not match:
+            return self.send_error(404)
+        if match.group(1) == 'audio':
+            return self._send(self.server.audio, 'audio/wav')
+        time.sleep(self.server.thumbnail_latency)
+        self._send(self.server.thumbnail(match.group(2)), 'image/jpeg')
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b"{}")
+        time.sleep(self.server.llm_latency)
+        if self.path.endswith("/chat/completions"):
+            prompt = body['messages'][-1]['content']
+            answer = fake_llm_answer(prompt)
+            response = {
+                'id': 'chatcmpl-bench', 'object': 'chat.completion', 'created': int(time.time()), 'model': body['model'],
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': answer}, 'finish_reason': 'stop'}],
+                'usage': _usage(prompt, answer, 'prompt_tokens', 'completion_tokens'),
+            }
+        elif self.path.endswith("/messages"):
+            prompt = body['messages'][-1]['content']
+            answer = fake_llm_answer(prompt)
+            response = {
+                'id': 'msg_bench', 'type': 'message', 'role': 'assistant', 'model': body['model'],
+                'content': [{'type': 'text', 'text': answer}], 'stop_reason': 'end_turn',
+                'usage': _usage(prompt, answer, 'input_tokens', 'output_tokens'),
+            }
+        elif self.path.split('?')[0].endswith(":generateContent"):
+            prompt = body['contents'][-1]['parts'][0]['text']
+            answer = fake_llm_answer(prompt)
+            response = {
+                'candidates': [{'content': {'role': 'model', 'parts': [{'text': answer}]}, 'finishReason': 'STOP'}],
+                'usageMetadata': _usage(prompt, answer, 'promptTokenCount', 'candidatesTokenCount'),
+            }
+        else:
+            return self.send_error(404)
+        self._send(json.dumps(response).encode('utf-8'), 'application/json')
+
+    def _send(self, data: bytes, content_type: str):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _usage(prompt: str, answer: str, input_key: str, output_key: str) -> dict:
+    return {input_key: len(prompt) // 4, output_key: len(answer) // 4} # Roughly 4 characters per token
+
+
+def install_fake_extractors(base_url: str):
+    """
+    Makes every YoutubeDL instance try the benchmark extractors before yt-dlp's own, so bench video and
+    playlist URLs are served locally while the real download, format selection and post-processing still run.
+    """
+    import yt_dlp
+    from yt_dlp.extractor.common import InfoExtractor
+
+    class BenchIE(InfoExtractor):
+        IE_NAME = 'bench'
+        _VALID_URL = r'https?://(?:www\.)?youtube\.com/watch\?v=(?P<id>bench\d{6})'
+
+        def _real_extract(self, url):
+            bench_id = self._match_id(url)
+            thumbnail = f"{base_url}/thumb/{bench_id}.jpg"
+            return {
+                'id': bench_id,
+                'title': track_title(int(bench_id[5:])),
+                'uploader': 'Benchmark Channel',
+                'channel': 'Benchmark Channel',
+                'webpage_url': url,
+                'thumbnail': thumbnail,
+                'thumbnails': [{'url': thumbnail, 'width': _THUMBNAIL_SIZE[0], 'height': _THUMBNAIL_SIZE[1]}],
+                'formats': [{
+                    'format_id': 'wav', 'url': f"{base_url}/audio/{bench_id}.wav", 'ext': 'wav',
+                    'acodec': 'pcm_s16le', 'vcodec': 'none', 'abr': 705, 'asr': _SAMPLE_RATE,
+                }],
+            }
+
+    class BenchPlaylistIE(InfoExtractor):
+        IE_NAME = 'bench:playlist'
+        _VALID_URL = r'https?://(?:www\.)?youtube\.com/playlist\?list=(?P<id>bench\d+)'
+
+        def _real_extract(self, url):
+            playlist_id = self._match_id(url)
+            entries = [
+                self.url_result(watch_url(i), BenchIE.ie_key(), video_id(i), track_title(i))
+                for i in range(int(playlist_id[5:]))
+            ]
+            return self.playlist_result(entries, playlist_id, 'Benchmark playlist')
+
+    base_class = yt_dlp.YoutubeDL
+
+    class BenchYoutubeDL(base_class):
+        def __init__(self, params=None, auto_init=True):
+            super().__init__(params, auto_init=False)
+            self.add_info_extractor(BenchIE())
+            self.add_info_extractor(BenchPlaylistIE())
+            if auto_init:
+                self.add_default_info_extractors()
+
+    yt_dlp.YoutubeDL = BenchYoutubeDL
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """
+    Nearest-rank percentile; 0.0 for an empty list.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak RSS of this process. ffmpeg children aren't included: their ru_maxrss counts the pages
+    inherited at fork, so it would only repeat the parent's figure.
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / (1024 * 1024 if sys.platform == 'darwin' else 1024) # Bytes on macOS, KiB on Linux
+
+
+def run_scenario(mode: str, args) -> dict:
+    """
+    Runs one scenario in this process and returns its measurements.
+    """
+    workdir = tempfile.mkdtemp(prefix=f"yt2spotify-bench-{mode}-")
+    server = BenchServer(generate_wav(args.track_seconds), args.llm_latency, args.thumbnail_latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Point every client at the local stand-ins before any of them is constructed
+    os.environ.update({
+        'YT_SPOTIFY_CACHE_DIR': os.path.join(workdir, 'cache'),
+        'OPENAI_API_KEY': 'bench', 'ANTHROPIC_API_KEY': 'bench', 'GEMINI_API_KEY': 'bench',
+        'OPENAI_BASE_URL': f"{server.base_url}/v1",
+        'ANTHROPIC_BASE_URL': server.base_url,
+        'GEMINI_BASE_URL': server.base_url,
+    })
+    install_fake_extractors(server.base_url)
+
+    from metrics import metrics
+    from orchestrator import Orchestrator
+
+    metrics_path = os.path.join(workdir, 'metrics.jsonl')
+    metrics.configure(jsonl_path=metrics_path)
+    log = sys.stdout if args.verbose else open(os.devnull, 'w')
+    try:
+        with redirect_stdout(log):
+            saver = Orchestrator(
+                llm_provider=args.llm_provider, output_dir=os.path.join(workdir, 'output'),
+                max_workers=args.concurrency, audio_format=args.audio_format, quiet=True
+            )
+            started = time.perf_counter()
+            try:
+                if mode == 'single':
+                    succeeded = sum(1 for i in range(args.tracks) if saver.save_youtube_to_spotify_local(watch_url(i)))
+                else:
+                    succeeded = sum(1 for r in saver.save_batch([playlist_url(args.tracks)]) if r['success'])
+            finally:
+                saver.close()
+            wall_time = time.perf_counter() - started
+    finally:
+        server.shutdown()
+        if log is not sys.stdout:
+            log.close()
+
+    with open(metrics_path, encoding='utf-8') as f:
+        spans = [json.loads(line) for line in f if line.strip()]
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    track_latencies = [s['duration_s'] for s in spans if s['stage'] == 'track']
+    stage_durations = {}
+    for span in spans:
+        if span['stage'] != 'track':
+            stage_durations.setdefault(span['stage'], []).append(span['duration_s'])
+    return {
+        'mode': mode,
+        'tracks': args.tracks,
+        'succeeded': succeeded,
+        'wall_time_s': round(wall_time, 3),
+        'tracks_per_min': round(60 * succeeded / wall_time, 1) if wall_time else 0.0,
+        'p50_s': round(percentile(track_latencies, 50), 3),
+        'p95_s': round(percentile(track_latencies, 95), 3),
+        'llm_requests': len(stage_durations.get('llm', [])),
+        'stage_p50_s': {stage: round(percentile(d, 50), 3) for stage, d in sorted(stage_durations.items())},
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def run_isolated(mode: str, args) -> dict:
+    """
+    Runs one scenario in a fresh interpreter, so its peak RSS and module state aren't shared.
+    """
+    command = [
+        sys.executable, os.path.abspath(__file__), '--mode', mode, '--json',
+        '--tracks', str(args.tracks), '--llm_provider', args.llm_provider, '--llm_latency', str(args.llm_latency),
+        '--thumbnail_latency', str(args.thumbnail_latency), '--track_seconds', str(args.track_seconds),
+        '--audio_format', args.audio_format,
+    ]
+    if args.concurrency:
+        command += ['--concurrency', str(args.concurrency)]
+    if args.keep:
+        command.append('--keep')
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_report(results: list[dict]):
+    print(f"{'Scenario':<8} {'Tracks':>6} {'OK':>4} {'Wall s':>8} {'Tracks/min':>10} {'p50 s':>7} {'p95 s':>7} "
+          f"{'LLM reqs':>8} {'Peak RSS MB':>11}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['tracks']:>6} {r['succeeded']:>4} {r['wall_time_s']:>8.2f} {r['tracks_per_min']:>10.1f} "
+              f"{r['p50_s']:>7.2f} {r['p95_s']:>7.2f} {r['llm_requests']:>8} {r['peak_rss_mb']:>11.1f}")
+    for r in results:
+        stages = ", ".join(f"{stage} {p50:.3f}s" for stage, p50 in r['stage_p50_s'].items())
+        print(f"{r['mode']} stage p50: {stages}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline end to end against local stand-ins.")
+    parser.add_argument("--tracks", type=int, default=20, help="Number of tracks per scenario.")
+    parser.add_argument("--mode", choices=['single', 'batch', 'both'], default='both',
+                        help="'single' runs tracks one at a time, 'batch' runs them as a playlist through the worker pool.")
+    parser.add_argument("--llm_provider", choices=['openai', 'claude', 'gemini'], default='openai',
+                        help="Which provider's API the fake LLM endpoint speaks.")
+    parser.add_argument("--llm_latency", type=float, default=0.5, help="Seconds the fake LLM takes per request.")
+    parser.add_argument("--thumbnail_latency", type=float, default=0.05, help="Seconds the thumbnail server takes per image.")
+    parser.add_argument("--track_seconds", type=float, default=30, help="Length of the generated audio per track.")
+    parser.add_argument("--audio_format", choices=['mp3', 'm4a', 'best'], default='mp3', help="Output format to produce.")
+    parser.add_argument("--concurrency", type=int, default=None, help="Batch worker pool size (default from Config).")
+    parser.add_argument("--json", action='store_true', help="Print the results as JSON lines instead of a table.")
+    parser.add_argument("--keep", action='store_true', help="Keep each scenario's output, caches and metrics.jsonl.")
+    parser.add_argument("--verbose", action='store_true', help="Show the pipeline's own output (with --mode single or batch).")
+    args = parser.parse_args()
+
+    if not shutil.which('ffmpeg'):
+        parser.error("ffmpeg is required on PATH.")
+
+    if args.mode == 'both':
+        results = [run_isolated(mode, args) for mode in ('single', 'batch')]
+    else:
+        results = [run_scenario(args.mode, args)]
+
+    if args.json:
+        for r in results:
+            print(json.dumps(r))
+    else:
+        print_report(results)
+
+
+if __name__ == "__main__":
+    main()
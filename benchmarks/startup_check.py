@@ -0,0 +1,114 @@
+"""
+Guards CLI startup time. Runs a few startup scenarios under `python -X importtime`. The check fails
+if a heavy dependency is imported where it should be deferred, or if import time exceeds a budget.
+
+Scenarios:
+- help: `main.py --help` imports none of the heavy dependencies
+- pipeline: `import orchestrator` leaves yt-dlp, the LLM SDKs, Pillow, requests and mutagen for first use
+- provider-<name>: building one provider's adapter imports that provider's SDK and no other
+
+Run from the repository root; exits with status 1 if any scenario fails:
+
+    python benchmarks/startup_check.py [--budget_ms 300] [--top 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('yt_dlp', 'openai', 'anthropic', 'google.generativeai', 'PIL', 'requests', 'mutagen')
+PROVIDER_SDKS = {'openai': 'openai', 'claude': 'anthropic', 'gemini': 'google.generativeai'}
+
+
+def scenarios() -> list[dict]:
+    """
+    Each scenario has interpreter arguments, the modules it must not import, and whether the import budget applies.
+    """
+    result = [
+        {'name': 'help', 'args': ['main.py', '--help'], 'forbidden': HEAVY_MODULES, 'budgeted': True},
+        {'name': 'pipeline', 'args': ['-c', 'import orchestrator'], 'forbidden': HEAVY_MODULES, 'budgeted': True},
+    ]
+    for provider, sdk in PROVIDER_SDKS.items():
+        result.append({
+            'name': f"provider-{provider}",
+            'args': ['-c', f"from llm_providers import create_provider; create_provider('{provider}', 'startup-check')"],
+            'forbidden': tuple(other for other in PROVIDER_SDKS.values() if other != sdk),
+            'budgeted': False, # The one SDK it does load dominates, so only its isolation is checked
+        })
+    return result
+
+
+def parse_importtime(stderr: str) -> tuple[dict, float]:
+    """
+    Returns ({module: cumulative_us}, total_ms) from -X importtime output.
+    The total sums the cumulative times of top-level imports.
+    """
+    modules = {}
+    total_us = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        module = name.strip()
+        modules[module] = int(cumulative)
+        if len(name) - len(name.lstrip()) == 1: # One space after the separator means no nesting
+            total_us += int(cumulative)
+    return modules, total_us / 1000
+
+
+def imported(modules: dict, package: str) -> bool:
+    return any(name == package or name.startswith(package + ".") for name in modules)
+
+
+def run_scenario(scenario: dict) -> dict:
+    command = [sys.executable, '-X', 'importtime', *scenario['args']]
+    env = dict(os.environ, PYTHONWARNINGS='ignore')
+    started = time.perf_counter()
+    completed = subprocess.run(command, cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    modules, import_ms = parse_importtime(completed.stderr)
+    return {
+        'name': scenario['name'],
+        'returncode': completed.returncode,
+        'wall_ms': wall_ms,
+        'import_ms': import_ms,
+        'modules': modules,
+        'leaked': [package for package in scenario['forbidden'] if imported(modules, package)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that CLI startup defers heavy imports.")
+    parser.add_argument("--budget_ms", type=float, default=300,
+                        help="Maximum total import time for the 'help' and 'pipeline' scenarios.")
+    parser.add_argument("--top", type=int, default=5, help="Number of slowest imports to list per scenario.")
+    args = parser.parse_args()
+
+    failed = False
+    for scenario in scenarios():
+        run_scenario(scenario) # Warm-up, so bytecode compilation isn't counted
+        result = run_scenario(scenario)
+
+        problems = []
+        if result['returncode'] != 0:
+            problems.append(f"exited with status {result['returncode']}")
+        if result['leaked']:
+            problems.append(f"imported {', '.join(result['leaked'])}")
+        if scenario['budgeted'] and result['import_ms'] > args.budget_ms:
+            problems.append(f"imports took {result['import_ms']:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+        failed = failed or bool(problems)
+
+        status = "FAIL: " + "; ".join(problems) if problems else "OK"
+        print(f"{result['name']:<18} imports {result['import_ms']:7.1f} ms  wall {result['wall_ms']:7.1f} ms  {status}")
+        slowest = sorted(result['modules'].items(), key=lambda item: item[1], reverse=True)[:args.top]
+        for module, cumulative_us in slowest:
+            print(f"    {cumulative_us / 1000:7.1f} ms  {module}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import hashlib
 import os
 
 class Config:
@@ -6,6 +7,36 @@ class Config:
         self.anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
         self.gemini_api_key = os.getenv("GEMINI_API_KEY")
         self.default_output_dir = os.path.expanduser("~/Music/SpotifyLocalFiles")
+        self.staging_max_age_days = 7 # Leftovers from failed jobs older than this are deleted; resuming them re-downloads
+        self.default_audio_format = "mp3" # 'mp3' (re-encode), 'm4a' (remux AAC) or 'best' (keep native codec)
+        self.default_concurrency = 4 # Worker pool size for batch/playlist runs
+        self.cache_dir = os.path.expanduser(os.getenv("YT_SPOTIFY_CACHE_DIR", "~/.cache/youtube_to_spotify"))
+        self.metadata_cache_path = os.path.join(self.cache_dir, "metadata_cache.sqlite3")
+        self.metadata_cache_max_entries = 50000
+        self.metadata_cache_max_age_days = 180
+        self.info_cache_dir = os.path.join(self.cache_dir, "video_info")
+        self.info_cache_max_age_seconds = 3 * 3600 # YouTube stream URLs in the cached info expire after ~6h
+        self.album_art_cache_dir = os.path.join(self.cache_dir, "album_art")
+        self.album_art_cache_max_age_days = 90 # Cover art not used for this long is deleted
+        self.album_art_cache_max_bytes = 200 * 1024 * 1024 # Least recently used cover art beyond this is deleted
+        # Tracks are downloaded and tagged here, then moved into the output directory. Kept out of the Music
+        # folder, which Spotify scans by default, and never inside the output directory
+        self.staging_dir = os.path.join(self.cache_dir, "staging")
+        self.max_cover_size = 800 # Longest edge of embedded cover art in pixels; 0 keeps the original size
+        self.max_image_bytes = 10 * 1024 * 1024
+        self.retry_attempts = 4 # Total tries for transient yt-dlp/HTTP/LLM failures
+        self.retry_base_delay = 1.0 # Seconds; backoff doubles per attempt with full jitter
+        self.retry_max_delay = 30.0
+        self.llm_batch_size = 20 # Titles packed into one LLM request by infer_metadata_batch
+        self.llm_request_timeout = 30.0 # Seconds before an LLM request counts as failed
+        self.llm_rate_limits = {'openai': 5.0, 'claude': 2.0, 'gemini': 2.0} # Starting requests/second; halved on each 429
+        self.llm_max_concurrency = 4 # In-flight requests per provider; halved on 429s and timeouts, then regrown
+        self.llm_hedge_min_samples = 20 # Latencies a provider needs before hedging can kick in
+        self.retag_workers = None # Processes reading and writing tags for --retag; None uses every CPU
+        self.title_parser_threshold = 0.85 # Rule-based parses at or above this confidence skip the LLM
+        # Where --serve listens and where the CLI looks for a running daemon: a Unix socket path, host:port or a port
+        self.daemon_address = os.getenv("YT_SPOTIFY_DAEMON", os.path.join(self.cache_dir, "daemon.sock"))
+        self.daemon_max_queued = 1000 # Submissions beyond this many waiting jobs are rejected
 
     def get_llm_api_key(self, llm_provider: str):
         if llm_provider.lower() == "openai":
@@ -24,4 +55,14 @@ class Config:
             raise ValueError(f"Unsupported LLM provider: {llm_provider}. Choose 'openai', 'claude', or 'gemini'.")
     
     def ensure_output_dir_exists(self, path: str):
-        os.makedirs(path, exist_ok=True)
\ No newline at end of file
+        os.makedirs(path, exist_ok=True)
+
+    def staging_dir_for(self, output_dir: str) -> str:
+        """
+        Returns (and creates) the staging directory for an output directory, one per output directory under staging_dir.
+        """
+        output_dir = os.path.abspath(output_dir)
+        digest = hashlib.sha256(output_dir.encode('utf-8')).hexdigest()[:12]
+        path = os.path.join(self.staging_dir, f"{os.path.basename(output_dir) or 'root'}-{digest}")
+        os.makedirs(path, exist_ok=True)
+        return path
@@ -0,0 +1,341 @@
+import http.client
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from metrics import metrics
+
+MAX_WAIT_SECONDS = 60 # Longest a status request may block waiting for a job to finish
+FINISHED_STATUSES = ('done', 'failed')
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+def parse_address(address: str) -> tuple[str, object]:
+    """
+    Interprets a daemon address. A filesystem path is a Unix socket; 'host:port' or a bare port is TCP.
+    Returns ('unix', path) or ('tcp', (host, port)).
+    """
+    if os.sep in address or address.endswith('.sock'):
+        return 'unix', os.path.expanduser(address)
+    host, _, port = address.rpartition(':')
+    if not port.isdigit():
+        raise ValueError(f"Invalid daemon address '{address}': expected a socket path, host:port or a port number.")
+    return 'tcp', (host or '127.0.0.1', int(port))
+
+
+class JobQueue:
+    """
+    Runs submitted URLs through one warm Orchestrator with bounded concurrency and keeps each job's status.
+    A playlist URL becomes a job that expands the playlist, batches its metadata inference and queues one
+    child job per video. Safe to use from the HTTP handler threads.
+    """
+
+    def __init__(self, orchestrator, max_queued: int = 1000, max_finished: int = 1000):
+        self.orchestrator = orchestrator
+        self.max_queued = max_queued
+        self.max_finished = max_finished # Older finished jobs are forgotten beyond this many
+        self._executor = ThreadPoolExecutor(max_workers=orchestrator.max_workers, thread_name_prefix="job")
+        self._jobs = {} # job id -> job dict, in submission order
+        self._changed = threading.Condition()
+
+    def submit(self, youtube_urls: list[str], parent: str = None, prefetched_metadata: dict = None,
+               force: bool = False) -> list[dict]:
+        """
+        Queues one job per URL and returns copies of the new jobs. With force, videos already in the
+        library are processed again, like the CLI's --force.
+        Raises QueueFullError if that would put more than max_queued jobs in the queue; children of a
+        playlist job are always accepted.
+        """
+        with self._changed:
+            queued = sum(1 for job in self._jobs.values() if job['status'] == 'queued')
+            if parent is None and queued + len(youtube_urls) > self.max_queued:
+                raise QueueFullError(f"The queue is full ({queued} jobs waiting, limit {self.max_queued}).")
+            jobs = []
+            for url in youtube_urls:
+                job = {
+                    'id': uuid.uuid4().hex[:12], 'url': url, 'status': 'queued', 'file_path': None, 'error': None,
+                    'parent': parent, 'children': None, 'submitted_at': time.time(), 'started_at': None,
+                    'finished_at': None,
+                }
+                self._jobs[job['id']] = job
+                jobs.append(dict(job))
+            self._prune()
+        for job in jobs:
+            self._executor.submit(self._run, job['id'], prefetched_metadata, force)
+        return jobs
+
+    def _run(self, job_id: str, prefetched_metadata: dict = None, force: bool = False):
+        url = self._update(job_id, status='running', started_at=time.time())['url']
+        skip_existing = False if force else None # None keeps the daemon's own setting
+        try:
+            if self.orchestrator.downloader.is_playlist_url(url):
+                entries = self.orchestrator.expand_urls([url])
+                if not entries:
+                    raise ValueError(f"Playlist {url} is empty or could not be enumerated.")
+                prefetched = self.orchestrator.prefetch_metadata(entries, skip_existing)
+                children = self.submit([entry['url'] for entry in entries], parent=job_id, prefetched_metadata=prefetched,
+                                       force=force)
+                self._update(job_id, status='done', children=[child['id'] for child in children], finished_at=time.time())
+                return
+            result = self.orchestrator.process_item(url, prefetched_metadata, skip_existing)
+            self._update(job_id, status='done' if result['success'] else 'failed', file_path=result['file_path'],
+                         error=result['error'], finished_at=time.time())
+        except Exception as e:
+            print(f"Error running job {job_id} for {url}: {e}")
+            self._update(job_id, status='failed', error=str(e), finished_at=time.time())
+
+    def _update(self, job_id: str, **fields) -> dict:
+        with self._changed:
+            job = self._jobs[job_id]
+            job.update(fields)
+            self._changed.notify_all()
+            return dict(job)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in FINISHED_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str, wait: float = 0) -> dict | None:
+        """
+        Returns a copy of a job, or None if it is unknown. With wait, blocks up to that many seconds
+        for the job to finish first.
+        """
+        with self._changed:
+            if wait > 0:
+                self._changed.wait_for(
+                    lambda: job_id not in self._jobs or self._jobs[job_id]['status'] in FINISHED_STATUSES, timeout=wait
+                )
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def jobs(self, status: str = None) -> list[dict]:
+        with self._changed:
+            return [dict(job) for job in self._jobs.values() if status is None or job['status'] == status]
+
+    def counts(self) -> dict:
+        counts = {'queued': 0, 'running': 0, 'done': 0, 'failed': 0}
+        with self._changed:
+            for job in self._jobs.values():
+                counts[job['status']] += 1
+        return counts
+
+    def close(self):
+        """
+        Lets running jobs finish and drops queued ones; their URLs can be submitted again later.
+        """
+        dropped = self.counts()['queued']
+        if dropped:
+            print(f"Dropping {dropped} queued jobs.")
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class _DaemonRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API: GET /health, GET /jobs[?status=], GET /jobs/<id>[?wait=seconds], POST /jobs, GET /metrics.
+    """
+
+    def log_message(self, format, *args):
+        pass # Pipeline output already goes to the daemon's stdout
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        job_queue = self.server.job_queue
+        if parsed.path == '/health':
+            orchestrator = job_queue.orchestrator
+            return self._send_json(200, {
+                'status': 'ok', 'pid': os.getpid(), 'jobs': job_queue.counts(),
+                'llm_provider': orchestrator.llm_provider, 'output_dir': os.path.abspath(orchestrator.output_dir),
+                'audio_format': orchestrator.downloader.audio_format,
+            })
+        if parsed.path == '/metrics':
+            return self._send(200, metrics.render_prometheus().encode('utf-8'), 'text/plain; version=0.0.4')
+        if parsed.path == '/jobs':
+            return self._send_json(200, {'jobs': job_queue.jobs(query.get('status', [None])[0])})
+        if parsed.path.startswith('/jobs/'):
+            try:
+                wait = min(float(query.get('wait', ['0'])[0]), MAX_WAIT_SECONDS)
+            except ValueError:
+                return self._send_json(400, {'error': "'wait' must be a number of seconds."})
+            job = job_queue.get(parsed.path[len('/jobs/'):], wait=wait)
+            if job is None:
+                return self._send_json(404, {'error': "Unknown job."})
+            return self._send_json(200, job)
+        self._send_json(404, {'error': f"No such endpoint: {parsed.path}"})
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/jobs':
+            return self._send_json(404, {'error': f"No such endpoint: {self.path}"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b"{}")
+            youtube_urls = [url for url in body.get('urls', []) if isinstance(url, str) and url.strip()]
+        except (ValueError, AttributeError):
+            return self._send_json(400, {'error': "Expected a JSON object like {\"urls\": [...]}."})
+
+        job_queue = self.server.job_queue
+        if body.get('resume'):
+            unfinished = [job['url'] for job in job_queue.orchestrator.journal.unfinished()]
+            youtube_urls = [url for url in unfinished if url not in youtube_urls] + youtube_urls
+        if not youtube_urls:
+            return self._send_json(400, {'error': "No URLs to process."})
+        try:
+            jobs = job_queue.submit(youtube_urls, force=bool(body.get('force')))
+        except QueueFullError as e:
+            return self._send_json(503, {'error': str(e)})
+        self._send_json(202, {'jobs': jobs})
+
+    def _send_json(self, status: int, payload: dict):
+        self._send(status, json.dumps(payload).encode('utf-8'), 'application/json')
+
+    def _send(self, status: int, data: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self) -> str:
+        return self.client_address[0] if self.client_address else 'unix-socket'
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(orchestrator, address: str, resume: bool = False, max_queued: int = 1000):
+    """
+    Serves the job API on a Unix socket or local TCP address until interrupted (Ctrl+C or SIGTERM).
+    The orchestrator stays warm between jobs; the caller closes it afterwards.
+    """
+    kind, target = parse_address(address)
+    if kind == 'unix':
+        if os.path.exists(target):
+            if DaemonClient(address).is_running():
+                raise RuntimeError(f"A daemon is already running at {address}.")
+            os.remove(target) # Left behind by a daemon that didn't shut down cleanly
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+        server = _ThreadingUnixHTTPServer(target, _DaemonRequestHandler)
+        os.chmod(target, 0o600) # Only the owner may submit jobs
+    else:
+        server = ThreadingHTTPServer(target, _DaemonRequestHandler)
+        server.daemon_threads = True
+    server.job_queue = JobQueue(orchestrator, max_queued=max_queued)
+
+    if resume:
+        unfinished = [job['url'] for job in orchestrator.journal.unfinished()]
+        if unfinished:
+            print(f"Resuming {len(unfinished)} unfinished jobs from the journal.")
+            server.job_queue.submit(unfinished)
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Serving on {address} with up to {orchestrator.max_workers} concurrent jobs. Press Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Shutting down daemon...")
+        server.server_close()
+        server.job_queue.close()
+        if kind == 'unix' and os.path.exists(target):
+            os.remove(target)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class DaemonClient:
+    """
+    Submits URLs to a running daemon and waits for the results.
+    Uses only the standard library, so the CLI stays quick to start when it acts as a thin client.
+    """
+
+    def __init__(self, address: str):
+        self.address = address
+        self.kind, self.target = parse_address(address)
+
+    def _request(self, method: str, path: str, payload: dict = None, timeout: float = 10) -> dict:
+        if self.kind == 'unix':
+            connection = _UnixHTTPConnection(self.target, timeout)
+        else:
+            connection = http.client.HTTPConnection(*self.target, timeout=timeout)
+        try:
+            body = json.dumps(payload).encode('utf-8') if payload is not None else None
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = json.loads(response.read() or b"{}")
+        finally:
+            connection.close()
+        if response.status >= 400:
+            raise RuntimeError(f"Daemon returned {response.status}: {data.get('error', 'unknown error')}")
+        return data
+
+    def health(self) -> dict | None:
+        """
+        Returns the daemon's status and pipeline settings ('llm_provider', 'output_dir', 'audio_format'),
+        or None if no daemon answers.
+        """
+        if self.kind == 'unix' and not os.path.exists(self.target):
+            return None
+        try:
+            health = self._request('GET', '/health', timeout=2)
+        except (OSError, ValueError, RuntimeError):
+            return None
+        return health if health.get('status') == 'ok' else None
+
+    def is_running(self) -> bool:
+        return self.health() is not None
+
+    def submit(self, youtube_urls: list[str], resume: bool = False, force: bool = False) -> list[dict]:
+        return self._request('POST', '/jobs', {'urls': youtube_urls, 'resume': resume, 'force': force})['jobs']
+
+    def get_job(self, job_id: str, wait: float = 0) -> dict:
+        return self._request('GET', f"/jobs/{job_id}?wait={wait:g}", timeout=wait + 10)
+
+    def run(self, youtube_urls: list[str], resume: bool = False, force: bool = False) -> bool:
+        """
+        Submits the URLs, prints each job's result as it finishes and a summary at the end.
+        Returns True if every job succeeded.
+        """
+        pending = self.submit(youtube_urls, resume=resume, force=force)
+        print(f"Submitted {len(pending)} jobs to the daemon at {self.address}.")
+        results = []
+        while pending:
+            job = self.get_job(pending[0]['id'], wait=MAX_WAIT_SECONDS)
+            if job['status'] not in FINISHED_STATUSES:
+                continue
+            pending.pop(0)
+            if job['children'] is not None:
+                print(f"Playlist {job['url']} queued {len(job['children'])} videos.")
+                pending.extend({'id': child_id} for child_id in job['children'])
+            elif job['status'] == 'done':
+                print(f"  [OK]   {job['url']} -> {job['file_path']}")
+                results.append(job)
+            else:
+                print(f"  [FAIL] {job['url']}: {job['error']}")
+                results.append(job)
+        succeeded = sum(1 for job in results if job['status'] == 'done')
+        print(f"{succeeded} succeeded, {len(results) - succeeded} failed, {len(results)} total.")
+        return succeeded == len(results)
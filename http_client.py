@@ -0,0 +1,50 @@
+import threading
+
+DEFAULT_TIMEOUT = (5, 20) # (connect, read) seconds
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> 'requests.Session':
+    """
+    Returns the process-wide pooled HTTP session, creating it on first use.
+    Connections are kept alive and reused across tracks and worker threads.
+    requests is imported here rather than at module load, so runs that never fetch art don't pay for it.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504), allowed_methods=("GET",))
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def fetch_bytes(url: str, timeout=DEFAULT_TIMEOUT, max_bytes: int = DEFAULT_MAX_BYTES) -> bytes:
+    """
+    Downloads a URL with the shared session, refusing bodies larger than max_bytes.
+    Raises requests.exceptions.RequestException on network/HTTP errors and ValueError if the body is too large.
+    """
+    with get_session().get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
+        content_length = response.headers.get('Content-Length')
+        if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+            raise ValueError(f"Response from '{url}' is {content_length} bytes, over the {max_bytes} byte limit.")
+
+        chunks = []
+        received = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            received += len(chunk)
+            if received > max_bytes:
+                raise ValueError(f"Response from '{url}' exceeded the {max_bytes} byte limit.")
+            chunks.append(chunk)
+        return b"".join(chunks)
@@ -0,0 +1,72 @@
+import json
+import os
+import threading
+import time
+
+
+class InfoCache:
+    """
+    On-disk cache of yt-dlp info dicts, one JSON file per video ID.
+    Lets a retry skip the extraction step. Entries expire after max_age_seconds because
+    the signed stream URLs inside them stop working after a few hours.
+    """
+
+    def __init__(self, cache_dir: str, max_age_seconds: float = 3 * 3600):
+        self.cache_dir = cache_dir
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, video_id: str) -> str:
+        safe_id = "".join(c for c in video_id if c.isalnum() or c in "-_")
+        return os.path.join(self.cache_dir, f"{safe_id}.json")
+
+    def get(self, video_id: str) -> dict | None:
+        path = self._path(video_id)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age_seconds:
+                os.remove(path)
+                return None
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, info_dict: dict):
+        """
+        Stores an info dict (already passed through YoutubeDL.sanitize_info) under its 'id'.
+        """
+        video_id = info_dict.get('id')
+        if not video_id:
+            return
+        path = self._path(video_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(info_dict, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Warning: Could not cache video info for {video_id}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def remove(self, video_id: str):
+        try:
+            os.remove(self._path(video_id))
+        except OSError:
+            pass
+
+    def prune(self) -> int:
+        """
+        Deletes entries older than max_age_seconds, and temporary files left by interrupted writes.
+        Expired entries are otherwise only removed when their video is requested again. Returns the number removed.
+        """
+        cutoff = time.time() - self.max_age_seconds
+        removed = 0
+        for entry in os.scandir(self.cache_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                pass # Removed or rewritten by another process
+        return removed
@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import threading
+import time
+
+JOURNAL_FILENAME = ".youtube_to_spotify_jobs.sqlite3"
+
+# Checkpoints in pipeline order. Inference can finish before the download, so resuming relies on
+# which checkpoint fields are filled in; 'stage' records the last checkpoint reached for status output.
+STAGES = ('pending', 'extracted', 'downloaded', 'inferred', 'tagged')
+
+_FIELDS = ('stage', 'video_id', 'youtube_title', 'thumbnail_url', 'uploader', 'file_path', 'title', 'artist',
+           'attempts', 'last_error')
+
+
+class JobJournal:
+    """
+    Durable per-URL job journal kept alongside the output directory.
+    Each job records the results of its completed stages so an interrupted or failed run can
+    resume from its last checkpoint instead of re-downloading and re-inferring.
+    Safe to share between worker threads.
+    """
+
+    def __init__(self, output_dir: str):
+        self.db_path = os.path.join(output_dir, JOURNAL_FILENAME)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " url TEXT PRIMARY KEY,"
+            " stage TEXT NOT NULL,"
+            " video_id TEXT,"
+            " youtube_title TEXT,"
+            " thumbnail_url TEXT,"
+            " uploader TEXT,"
+            " file_path TEXT,"
+            " title TEXT,"
+            " artist TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " last_error TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def start(self, url: str) -> dict:
+        """
+        Returns the journal entry for a URL, creating a 'pending' one if needed, and counts the attempt.
+        Jobs that already reached 'tagged' are restarted from scratch.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE url = ?", (url,)).fetchone()
+            if row is None or row['stage'] == 'tagged':
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO jobs (url, stage, attempts, created_at, updated_at)"
+                    " VALUES (?, 'pending', 1, ?, ?)",
+                    (url, now, now)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET attempts = attempts + 1, last_error = NULL, updated_at = ? WHERE url = ?",
+                    (now, url)
+                )
+            self._conn.commit()
+            return dict(self._conn.execute("SELECT * FROM jobs WHERE url = ?", (url,)).fetchone())
+
+    def checkpoint(self, url: str, stage: str, **fields):
+        """
+        Records that a stage finished, along with the fields it produced.
+        """
+        if stage not in STAGES:
+            raise ValueError(f"Unknown job stage: {stage}")
+        unknown = set(fields) - set(_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+        fields['stage'] = stage
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = ? WHERE url = ?",
+                (*fields.values(), time.time(), url)
+            )
+            self._conn.commit()
+
+    def mark_failed(self, url: str, error: str):
+        """
+        Stores the error but keeps the stage and checkpoint fields so the job can resume.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET last_error = ?, updated_at = ? WHERE url = ?", (error, time.time(), url)
+            )
+            self._conn.commit()
+
+    def get(self, url: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def unfinished(self) -> list[dict]:
+        """
+        Jobs that never reached 'tagged', oldest first: interrupted runs and failed ones.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE stage != 'tagged' ORDER BY created_at"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
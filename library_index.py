@@ -0,0 +1,145 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from youtube_downloader import YouTubeDownloader
+
+INDEX_FILENAME = ".youtube_to_spotify_library.sqlite3"
+
+
+class LibraryIndex:
+    """
+    Persistent index of the tracks saved into the output directory, keyed by YouTube video ID.
+    Lets the pipeline recognize an already downloaded URL before doing any network work.
+    Safe to share between worker threads.
+    """
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.db_path = os.path.join(output_dir, INDEX_FILENAME)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tracks ("
+            " video_id TEXT PRIMARY KEY,"
+            " source_url TEXT,"
+            " output_path TEXT NOT NULL,"
+            " size INTEGER,"
+            " mtime REAL,"
+            " content_hash TEXT,"
+            " title TEXT,"
+            " artist TEXT,"
+            " source_title TEXT,"
+            " tagged_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tracks_source_url ON tracks(source_url)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tracks_output_path ON tracks(output_path)")
+        self._conn.commit()
+
+    def lookup(self, youtube_url: str = None, video_id: str = None) -> dict | None:
+        """
+        Returns the index entry for a video if its file is still present and unchanged in size, else None.
+        Looks up by video ID (parsed from the URL when not given), falling back to the exact source URL.
+        """
+        video_id = video_id or (YouTubeDownloader.extract_video_id(youtube_url) if youtube_url else None)
+        with self._lock:
+            if video_id:
+                row = self._conn.execute("SELECT * FROM tracks WHERE video_id = ?", (video_id,)).fetchone()
+            elif youtube_url:
+                row = self._conn.execute("SELECT * FROM tracks WHERE source_url = ?", (youtube_url,)).fetchone()
+            else:
+                return None
+        if row is None:
+            return None
+
+        entry = dict(row)
+        try:
+            if os.path.getsize(entry['output_path']) == entry['size']:
+                return entry
+        except OSError:
+            pass
+        # File was deleted or replaced outside the tool
+        self.remove(entry['video_id'])
+        return None
+
+    def record(self, video_id: str, source_url: str, output_path: str, title: str, artist: str,
+               source_title: str = None, content_hash: str = None):
+        """
+        Adds or replaces the entry for a saved track, hashing the final file unless content_hash is given.
+        """
+        stat = os.stat(output_path)
+        content_hash = content_hash if content_hash else self.hash_file(output_path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tracks"
+                " (video_id, source_url, output_path, size, mtime, content_hash, title, artist, source_title, tagged_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (video_id, source_url, os.path.abspath(output_path), stat.st_size, stat.st_mtime, content_hash,
+                 title, artist, source_title, time.time())
+            )
+            self._conn.commit()
+
+    def remove(self, video_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM tracks WHERE video_id = ?", (video_id,))
+            self._conn.commit()
+
+    def entries(self) -> list[dict]:
+        with self._lock:
+            return [dict(row) for row in self._conn.execute("SELECT * FROM tracks ORDER BY output_path")]
+
+    def rebuild(self) -> dict:
+        """
+        Rescans the output directory and re-indexes every audio file whose tags record a YouTube video ID.
+        Files whose path, size and mtime match an existing entry are not re-hashed.
+        Returns counts of {'indexed', 'unchanged', 'untracked', 'removed'}.
+        """
+        import audio_tags # Deferred: mutagen is only needed when rescanning files
+        known = {entry['output_path']: entry for entry in self.entries()}
+        seen_ids = set()
+        counts = {'indexed': 0, 'unchanged': 0, 'untracked': 0, 'removed': 0}
+
+        for root, dirs, files in os.walk(self.output_dir):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for name in files:
+                path = os.path.abspath(os.path.join(root, name))
+                if not audio_tags.is_supported(path):
+                    continue
+                stat = os.stat(path)
+                entry = known.get(path)
+                if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                    seen_ids.add(entry['video_id'])
+                    counts['unchanged'] += 1
+                    continue
+
+                tags = audio_tags.read_tags(path)
+                video_id = tags['source'].get('video_id') if tags else None
+                if not video_id:
+                    counts['untracked'] += 1 # Not saved by this tool, or saved before source tags existed
+                    continue
+                self.record(video_id, tags['source'].get('url'), path, tags['title'], tags['artist'],
+                            tags['source'].get('title'))
+                seen_ids.add(video_id)
+                counts['indexed'] += 1
+
+        for entry in known.values():
+            if entry['video_id'] not in seen_ids:
+                self.remove(entry['video_id'])
+                counts['removed'] += 1
+        return counts
+
+    @staticmethod
+    def hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,104 @@
+import os
+from abc import ABC, abstractmethod
+
+
+class LLMProvider(ABC):
+    """
+    Adapter around one LLM SDK. Each subclass imports its SDK when it is constructed, so a run
+    only ever loads the providers it actually uses.
+    timeout bounds each request in seconds (None keeps the SDK default). The SDKs' own retries are
+    turned off; LLMRouter retries, rate-limits and falls back instead.
+    """
+    name = None
+    model = None
+
+    @abstractmethod
+    def complete(self, prompt: str, max_tokens: int = 500) -> tuple[str, int | None, int | None]:
+        """
+        Sends a single-turn prompt asking for JSON and returns (text, input_tokens, output_tokens).
+        Token counts are None when the provider doesn't report them.
+        """
+        raise NotImplementedError
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+    model = "gpt-4o" # Or "gpt-3.5-turbo"
+
+    def __init__(self, api_key: str, timeout: float = None):
+        from openai import OpenAI
+        options = {'timeout': timeout} if timeout else {}
+        self.client = OpenAI(api_key=api_key, max_retries=0, **options) # Honors OPENAI_BASE_URL
+
+    def complete(self, prompt: str, max_tokens: int = 500) -> tuple[str, int | None, int | None]:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"}
+        )
+        usage = getattr(response, 'usage', None)
+        return (response.choices[0].message.content,
+                getattr(usage, 'prompt_tokens', None), getattr(usage, 'completion_tokens', None))
+
+
+class ClaudeProvider(LLMProvider):
+    name = "claude"
+    model = "claude-3-opus-20240229" # Or other Claude models
+
+    def __init__(self, api_key: str, timeout: float = None):
+        from anthropic import Anthropic
+        options = {'timeout': timeout} if timeout else {}
+        self.client = Anthropic(api_key=api_key, max_retries=0, **options) # Honors ANTHROPIC_BASE_URL
+
+    def complete(self, prompt: str, max_tokens: int = 500) -> tuple[str, int | None, int | None]:
+        response = self.client.messages.create(
+            model=self.model,
+            max_tokens=max_tokens,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        usage = getattr(response, 'usage', None)
+        return (response.content[0].text, # Claude returns a list of content blocks
+                getattr(usage, 'input_tokens', None), getattr(usage, 'output_tokens', None))
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+    model = "gemini-1.5-pro" # Or 'gemini-1.5-flash', etc.
+
+    def __init__(self, api_key: str, timeout: float = None):
+        import google.generativeai as genai
+        self._genai = genai
+        self.timeout = timeout
+        base_url = os.getenv("GEMINI_BASE_URL") # Like OPENAI_BASE_URL/ANTHROPIC_BASE_URL, for proxies and local stand-ins
+        if base_url:
+            genai.configure(api_key=api_key, transport='rest', client_options={'api_endpoint': base_url})
+        else:
+            genai.configure(api_key=api_key)
+        self.client = genai.GenerativeModel(self.model)
+
+    def complete(self, prompt: str, max_tokens: int = 500) -> tuple[str, int | None, int | None]:
+        response = self.client.generate_content(
+            prompt,
+            generation_config=self._genai.types.GenerationConfig(response_mime_type="application/json"),
+            request_options={'timeout': self.timeout} if self.timeout else None
+        )
+        usage = getattr(response, 'usage_metadata', None)
+        return (response.text, # Gemini text attribute for generated content
+                getattr(usage, 'prompt_token_count', None), getattr(usage, 'candidates_token_count', None))
+
+
+PROVIDERS = {
+    OpenAIProvider.name: OpenAIProvider,
+    ClaudeProvider.name: ClaudeProvider,
+    GeminiProvider.name: GeminiProvider,
+}
+
+
+def create_provider(llm_provider: str, api_key: str, timeout: float = None) -> LLMProvider:
+    """
+    Builds the adapter for a provider name, importing only that provider's SDK.
+    """
+    provider_class = PROVIDERS.get(llm_provider.lower())
+    if provider_class is None:
+        raise ValueError(f"Unsupported LLM provider: {llm_provider}")
+    return provider_class(api_key, timeout=timeout)
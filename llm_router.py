@@ -0,0 +1,238 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+from llm_providers import LLMProvider
+from metrics import metrics
+from retry import is_rate_limit_error, is_transient_error, retry_after_seconds, retry_call
+
+_TIMEOUT_ERROR_NAMES = {'APITimeoutError', 'Timeout', 'ReadTimeout', 'ConnectTimeout', 'TimeoutError', 'DeadlineExceeded'}
+
+
+def _is_timeout(exc: BaseException) -> bool:
+    return type(exc).__name__ in _TIMEOUT_ERROR_NAMES
+
+
+class LLMUnavailableError(RuntimeError):
+    """
+    Raised when no provider in the chain returned a usable answer.
+    """
+
+
+class ProviderLimiter:
+    """
+    Token bucket plus an adaptive in-flight limit for one provider.
+    A rate limit (429) pauses the bucket for the server's Retry-After and halves both the request
+    rate and the in-flight limit. Successes grow them back gradually (additive increase, multiplicative decrease).
+    After trip_after_timeouts timeouts in a row the provider is tripped for trip_seconds, and the router
+    skips it while another provider is available; one more timeout after that trips it again.
+    Also keeps recent latencies so the router can decide when to hedge. Safe to share between threads.
+    """
+
+    def __init__(self, rate: float, max_concurrency: int, min_rate: float = 0.1, trip_after_timeouts: int = 3,
+                 trip_seconds: float = 60.0):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(max_concurrency)
+        self._burst = max(1.0, rate)
+        self._tokens = self._burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._in_flight = 0
+        self._latencies = deque(maxlen=200)
+        self.trip_after_timeouts = trip_after_timeouts
+        self.trip_seconds = trip_seconds
+        self._consecutive_timeouts = 0
+        self._tripped_until = 0.0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def acquire(self):
+        """
+        Blocks until the provider may take another request, and holds an in-flight slot for the block.
+        """
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self._burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._blocked_until and self._tokens >= 1 and self._in_flight < int(self.concurrency):
+                    self._tokens -= 1
+                    self._in_flight += 1
+                    break
+                delay = max(self._blocked_until - now, (1 - self._tokens) / self.rate, 0.01)
+                self._cond.wait(timeout=min(delay, 1.0)) # Releases and limit changes also wake us
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def on_success(self, latency: float):
+        with self._cond:
+            self._latencies.append(latency)
+            self._consecutive_timeouts = 0
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            self._cond.notify_all()
+
+    def on_rate_limited(self, retry_after: float = None):
+        with self._cond:
+            pause = retry_after if retry_after is not None else 1 / self.rate
+            self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.concurrency = max(1.0, self.concurrency / 2)
+            self._tokens = min(self._tokens, 0.0)
+
+    def on_timeout(self) -> bool:
+        """
+        Halves the in-flight limit. Returns True if this timeout tripped the provider.
+        """
+        with self._cond:
+            self.concurrency = max(1.0, self.concurrency / 2)
+            self._consecutive_timeouts += 1
+            if self._consecutive_timeouts >= self.trip_after_timeouts and not self.is_tripped():
+                self._tripped_until = time.monotonic() + self.trip_seconds
+                return True
+            return False
+
+    def is_tripped(self) -> bool:
+        return time.monotonic() < self._tripped_until
+
+    def latency_percentile(self, pct: float, min_samples: int = 20) -> float | None:
+        """
+        Nearest-rank percentile of recent successful latencies, or None until min_samples have been seen.
+        """
+        with self._cond:
+            if len(self._latencies) < min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+class LLMRouter:
+    """
+    Sends prompts through an ordered chain of providers, each behind its own ProviderLimiter.
+    Transient errors are retried with backoff. A provider that still fails, or whose answer can't be
+    parsed, hands the request to the next provider in the chain. Timeouts are handed on straight away
+    rather than retried (unless it is the last provider), and tripped providers are skipped.
+    With hedge_percentile set, a request that runs past that percentile of the provider's recent
+    latencies gets a second copy sent to the next provider (or the same one if it is the last);
+    the first usable answer wins.
+    """
+
+    def __init__(self, providers: list[LLMProvider], limiters: dict[str, ProviderLimiter], retry_options: dict = None,
+                 hedge_percentile: float = None, hedge_min_samples: int = 20):
+        self.providers = providers
+        self.limiters = limiters
+        self.retry_options = retry_options or {}
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self._hedge_executor = (ThreadPoolExecutor(max_workers=4 * len(providers), thread_name_prefix="llm")
+                                if hedge_percentile else None)
+
+    def query(self, prompt: str, parse, max_tokens: int = 500, description: str = "LLM call") -> tuple[object, LLMProvider]:
+        """
+        Returns (parse(text), provider) from the first provider whose answer parses.
+        parse should raise ValueError for an unusable answer.
+        Raises LLMUnavailableError if every provider fails.
+        """
+        # Providers that keep timing out sit out their cooldown, unless every provider has tripped
+        chain = [provider for provider in self.providers if not self.limiters[provider.name].is_tripped()]
+        chain = chain or list(self.providers)
+        errors = []
+        for position, provider in enumerate(chain):
+            if provider is not self.providers[0]:
+                print(f"Falling back to {provider.name} for {description}.")
+                metrics.increment('llm_fallbacks_total', provider=provider.name)
+            retry_timeouts = position == len(chain) - 1 # Waiting out a timeout again only pays off with no one left to ask
+            try:
+                if self._hedge_executor:
+                    hedge_provider = chain[position + 1] if position + 1 < len(chain) else provider
+                    return self._query_hedged(provider, hedge_provider, prompt, parse, max_tokens, description,
+                                              retry_timeouts)
+                return self._query_provider(provider, prompt, parse, max_tokens, description, retry_timeouts), provider
+            except Exception as e:
+                print(f"Error from {provider.name} during {description}: {e}")
+                errors.append(f"{provider.name}: {e}")
+        raise LLMUnavailableError(f"No LLM provider could complete the {description} ({'; '.join(errors)}).")
+
+    def _query_provider(self, provider: LLMProvider, prompt: str, parse, max_tokens: int, description: str,
+                        retry_timeouts: bool = True, sent: threading.Event = None):
+        """
+        Queries one provider with retries and returns parse(text). sent, if given, is set once the
+        first request actually goes out, after any wait for a worker or the limiter.
+        """
+        limiter = self.limiters[provider.name]
+
+        def attempt():
+            with limiter.acquire(), metrics.span('llm', provider=provider.name, model=provider.model) as span:
+                if sent:
+                    sent.set()
+                start = time.perf_counter()
+                try:
+                    content, span['input_tokens'], span['output_tokens'] = provider.complete(prompt, max_tokens)
+                except Exception as e:
+                    if is_rate_limit_error(e):
+                        span['rate_limited'] = True
+                        limiter.on_rate_limited(retry_after_seconds(e))
+                    elif _is_timeout(e) and limiter.on_timeout():
+                        print(f"{provider.name} timed out {limiter.trip_after_timeouts} times in a row; "
+                              f"skipping it for {limiter.trip_seconds:g}s while another provider is available.")
+                    raise
+                limiter.on_success(time.perf_counter() - start)
+            if not isinstance(content, str):
+                print(f"Warning: LLM response content is not a string: {content}")
+                content = str(content)
+            return parse(content)
+
+        def should_retry(e):
+            return is_transient_error(e) and (retry_timeouts or not _is_timeout(e))
+
+        return retry_call(attempt, description=f"{description} ({provider.name})", should_retry=should_retry,
+                          **self.retry_options)
+
+    def _query_hedged(self, provider: LLMProvider, hedge_provider: LLMProvider, prompt: str, parse, max_tokens: int,
+                      description: str, retry_timeouts: bool = True) -> tuple[object, LLMProvider]:
+        def submit(target, sent=None):
+            future = self._hedge_executor.submit(
+                contextvars.copy_context().run, self._query_provider, target, prompt, parse, max_tokens, description,
+                retry_timeouts, sent
+            )
+            futures[future] = target
+            return future
+
+        futures = {}
+        sent = threading.Event()
+        first = submit(provider, sent)
+        hedge_delay = self.limiters[provider.name].latency_percentile(self.hedge_percentile, self.hedge_min_samples)
+        if hedge_delay is not None:
+            # The hedge clock starts when the request goes out; queueing for a worker or the limiter isn't provider latency
+            while not sent.wait(timeout=0.05) and not first.done():
+                pass
+        done, _ = wait([first], timeout=hedge_delay)
+        if not done:
+            print(f"{description} to {provider.name} is slower than its p{self.hedge_percentile:g}; "
+                  f"hedging with {hedge_provider.name}.")
+            metrics.increment('llm_hedges_total', provider=hedge_provider.name)
+            submit(hedge_provider)
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result(), futures[future] # The other request is left to finish on its own
+                error = error or future.exception()
+        raise error
+
+    def close(self):
+        if self._hedge_executor:
+            self._hedge_executor.shutdown(wait=False, cancel_futures=True)
@@ -1,54 +1,299 @@
 import argparse
 import os
-from dotenv import load_dotenv
+import sys
 
-load_dotenv()
-
-from orchestrator import Orchestrator
 from config import Config
+from metrics import metrics
+
+def read_url_list(path: str) -> list[str]:
+    """
+    Reads one URL per line from a file, or from stdin when path is '-'.
+    Blank lines and lines starting with '#' are ignored.
+    """
+    if path == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.strip().startswith('#')]
+
+# Pipeline options a running daemon can't change per job; it uses the values from its own command line
+DAEMON_FIXED_OPTIONS = ('concurrency', 'no_cache', 'bypass_cache', 'rule_threshold', 'max_cover_size', 'sequential',
+                        'llm_fallback', 'llm_timeout', 'llm_hedge_percentile', 'metrics_jsonl', 'metrics_prom')
+
+def daemon_unsupported_options(args: argparse.Namespace, health: dict) -> list[str]:
+    """
+    Returns the explicitly given pipeline options a running daemon would ignore. --output_dir, --audio_format
+    and --llm_provider are fine when they match the daemon's; --force is sent along with the jobs.
+    """
+    unsupported = [f"--{name}" for name in DAEMON_FIXED_OPTIONS if getattr(args, name) not in (None, False)]
+    if args.output_dir and os.path.abspath(args.output_dir) != health.get('output_dir'):
+        unsupported.append("--output_dir")
+    if args.audio_format and args.audio_format != health.get('audio_format'):
+        unsupported.append("--audio_format")
+    if args.llm_provider and args.llm_provider != health.get('llm_provider'):
+        unsupported.append("--llm_provider")
+    return unsupported
 
 def main():
     parser = argparse.ArgumentParser(
         description="Save YouTube video audio to Spotify Local Files with automated metadata."
     )
     parser.add_argument(
-        "youtube_url",
-        help="The URL of the YouTube video"
+        "youtube_urls",
+        nargs='*',
+        metavar="youtube_url",
+        help="The URL of the YouTube video (or playlist). Several URLs may be given."
+    )
+    parser.add_argument(
+        "--batch_file",
+        default=None,
+        help="Optional: File with one YouTube URL per line, or '-' to read URLs from stdin."
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help=f"Optional: Maximum number of URLs processed at once in batch/playlist mode. Defaults to {Config().default_concurrency}."
     )
     parser.add_argument(
         "--output_dir",
         default=None,
         help=f"Optional: Directory where Spotify local files are configured. Defaults to '{Config().default_output_dir}'."
     )
+    parser.add_argument(
+        "--audio_format",
+        choices=['mp3', 'm4a', 'best'],
+        default=None,
+        help=f"Optional: Output format. 'mp3' re-encodes at 192k, 'm4a' remuxes the AAC stream without re-encoding, 'best' keeps the native codec (often Opus, which Spotify may not play). Defaults to '{Config().default_audio_format}'."
+    )
+    parser.add_argument(
+        "--no_cache",
+        action='store_true',
+        help="Optional: Disable the on-disk caches (LLM metadata, extracted video info and album art) entirely."
+    )
+    parser.add_argument(
+        "--bypass_cache",
+        action='store_true',
+        help="Optional: Ignore cached LLM results for this run (fresh results are still stored)."
+    )
+    parser.add_argument(
+        "--rule_threshold",
+        type=float,
+        default=None,
+        help=f"Optional: Confidence (0-1) at which the local title parser skips the LLM. Use a value above 1 to always call the LLM. Defaults to {Config().title_parser_threshold}."
+    )
+    parser.add_argument(
+        "--max_cover_size",
+        type=int,
+        default=None,
+        help=f"Optional: Downscale embedded album art so its longest edge is at most this many pixels (0 keeps the original). Defaults to {Config().max_cover_size}."
+    )
+    parser.add_argument(
+        "--sequential",
+        action='store_true',
+        help="Optional: Run metadata inference and album art fetch one after another instead of alongside the download."
+    )
+    parser.add_argument(
+        "--force",
+        action='store_true',
+        help="Optional: Download and tag videos again even if they are already in the library index."
+    )
+    parser.add_argument(
+        "--resume",
+        action='store_true',
+        help="Optional: Also resume every unfinished job from the job journal, continuing from its last completed stage."
+    )
+    parser.add_argument(
+        "--metrics_jsonl",
+        default=None,
+        help="Optional: Append one JSON line per pipeline stage span (durations, bytes, LLM tokens, cache hits, errors) to this file."
+    )
+    parser.add_argument(
+        "--metrics_prom",
+        default=None,
+        help="Optional: Write Prometheus text-format metrics to this file, refreshed after every track."
+    )
+    parser.add_argument(
+        "--quiet",
+        action='store_true',
+        help="Optional: Drop yt-dlp's output and the per-chunk download progress lines."
+    )
+    parser.add_argument(
+        "--llm_fallback",
+        default=None,
+        help="Optional: Comma-separated providers to try, in order, when --llm_provider fails (e.g. claude,gemini). Each needs its API key."
+    )
+    parser.add_argument(
+        "--llm_timeout",
+        type=float,
+        default=None,
+        help=f"Optional: Seconds before an LLM request counts as failed. Defaults to {Config().llm_request_timeout:g}."
+    )
+    parser.add_argument(
+        "--llm_hedge_percentile",
+        type=float,
+        default=None,
+        help="Optional: Send a second, hedged LLM request when the first runs past this latency percentile of recent requests (e.g. 95)."
+    )
+    parser.add_argument(
+        "--serve",
+        action='store_true',
+        help="Optional: Run as a long-lived daemon that keeps the pipeline warm and accepts URLs over --daemon_address."
+    )
+    parser.add_argument(
+        "--daemon_address",
+        default=None,
+        help=f"Optional: Unix socket path, host:port or port for the daemon. Defaults to {Config().daemon_address} (or $YT_SPOTIFY_DAEMON)."
+    )
+    parser.add_argument(
+        "--no_daemon",
+        action='store_true',
+        help="Optional: Process URLs in this process even if a daemon is running."
+    )
+    parser.add_argument(
+        "--rebuild_index",
+        action='store_true',
+        help="Rescan the output directory's tags and rebuild the library index, then exit. No LLM provider needed."
+    )
+    parser.add_argument(
+        "--retag",
+        action='store_true',
+        help="Re-run metadata inference on the stored YouTube titles of every track in the output directory and rewrite the tags that change, then exit."
+    )
+    parser.add_argument(
+        "--dry_run",
+        action='store_true',
+        help="Optional: With --retag, print the tag changes without writing them."
+    )
     parser.add_argument(
         "--llm_provider",
         choices=['openai', 'claude', 'gemini'],
-        required=True,
-        help="Specify the LLM provider to use (openai or claude)."
+        default=None,
+        help="Specify the LLM provider to use (openai, claude or gemini). Required unless --rebuild_index is given or a daemon is running (--retag always needs it)."
     )
 
     args = parser.parse_args()
 
-    if args.llm_provider == 'openai' and not os.getenv("OPENAI_API_KEY"):
-        print("Error: OPENAI_API_KEY environment variable not set.")
-        print("Please set it before running the script (e.g., export OPENAI_API_KEY='your_key').")
-        return
-    if args.llm_provider == 'claude' and not os.getenv("ANTHROPIC_API_KEY"):
-        print("Error: ANTHROPIC_API_KEY environment variable not set.")
-        print("Please set it before running the script (e.g., export ANTHROPIC_API_KEY='your_key').")
-        return
-    if args.llm_provider == 'gemini' and not os.getenv("GEMINI_API_KEY"):
-        print("Error: GEMINI_API_KEY environment variable not set.")
-        print("Please set it before running the script (e.g., export GEMINI_API_KEY='your_key').")
+    # Everything else is imported after argument parsing, so --help and usage errors return immediately
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    if args.rebuild_index:
+        from library_index import LibraryIndex
+        output_dir = args.output_dir if args.output_dir else Config().default_output_dir
+        Config().ensure_output_dir_exists(output_dir)
+        library_index = LibraryIndex(output_dir)
+        print(f"Rebuilding library index for {output_dir}...")
+        counts = library_index.rebuild()
+        library_index.close()
+        print(f"Indexed {counts['indexed']}, unchanged {counts['unchanged']}, "
+              f"untracked {counts['untracked']}, removed {counts['removed']} stale entries.")
         return
 
+    if args.concurrency is not None and args.concurrency < 1:
+        parser.error("--concurrency must be at least 1.")
+
+    youtube_urls = list(args.youtube_urls)
+    if args.batch_file:
+        youtube_urls.extend(read_url_list(args.batch_file))
+    daemon_address = args.daemon_address if args.daemon_address else Config().daemon_address
+
+    if args.dry_run and not args.retag:
+        parser.error("--dry_run only applies to --retag.")
+
+    if not args.serve and not args.retag:
+        if not youtube_urls and not args.resume:
+            parser.error("Provide a YouTube URL, --batch_file, --resume or --serve.")
+        if not args.no_daemon:
+            from daemon import DaemonClient
+            try:
+                client = DaemonClient(daemon_address)
+            except ValueError as e:
+                parser.error(str(e))
+            health = client.health()
+            unsupported = daemon_unsupported_options(args, health) if health else []
+            if unsupported:
+                if not args.llm_provider:
+                    parser.error(f"The daemon at {daemon_address} can't apply {', '.join(unsupported)}. "
+                                 f"Pass --llm_provider to run in this process, or drop those options.")
+                print(f"Running in this process: the daemon at {daemon_address} can't apply {', '.join(unsupported)}.")
+            elif health:
+                # A warm daemon does the work
+                try:
+                    succeeded = client.run(youtube_urls, resume=args.resume, force=args.force)
+                except (OSError, RuntimeError) as e:
+                    print(f"Error talking to the daemon at {daemon_address}: {e}")
+                    sys.exit(1)
+                if not succeeded:
+                    sys.exit(1)
+                return
+
+    if not args.llm_provider:
+        parser.error("--llm_provider is required unless a daemon is running." if not args.retag else "--retag needs --llm_provider.")
+
+    llm_fallback = [name.strip().lower() for name in (args.llm_fallback or "").split(",") if name.strip()]
+    for name in llm_fallback:
+        if name not in ('openai', 'claude', 'gemini'):
+            parser.error(f"--llm_fallback: unknown provider '{name}' (choose from openai, claude, gemini).")
+    llm_fallback = [name for name in dict.fromkeys(llm_fallback) if name != args.llm_provider]
+    if args.llm_hedge_percentile is not None and not 0 < args.llm_hedge_percentile < 100:
+        parser.error("--llm_hedge_percentile must be between 0 and 100.")
+
+    api_key_variables = {'openai': "OPENAI_API_KEY", 'claude': "ANTHROPIC_API_KEY", 'gemini': "GEMINI_API_KEY"}
+    for provider in [args.llm_provider] + llm_fallback:
+        variable = api_key_variables[provider]
+        if not os.getenv(variable):
+            print(f"Error: {variable} environment variable not set.")
+            print(f"Please set it before running the script (e.g., export {variable}='your_key').")
+            return
+
+    metrics.configure(jsonl_path=args.metrics_jsonl, prometheus_path=args.metrics_prom)
+
+    from orchestrator import Orchestrator # yt-dlp, the LLM SDK, Pillow and mutagen load on first use
 
     saver = Orchestrator(
         llm_provider=args.llm_provider,
-        output_dir=args.output_dir
+        output_dir=args.output_dir,
+        max_workers=args.concurrency,
+        use_cache=not args.no_cache,
+        bypass_cache=args.bypass_cache,
+        title_parser_threshold=args.rule_threshold,
+        concurrent_stages=not args.sequential,
+        max_cover_size=args.max_cover_size,
+        audio_format=args.audio_format,
+        skip_existing=not args.force,
+        quiet=args.quiet,
+        llm_fallback=llm_fallback,
+        llm_timeout=args.llm_timeout,
+        hedge_percentile=args.llm_hedge_percentile
     )
 
-    saver.save_youtube_to_spotify_local(args.youtube_url)
+    try:
+        if args.serve:
+            from daemon import serve
+            serve(saver, daemon_address, resume=args.resume, max_queued=Config().daemon_max_queued)
+            return
+        if args.retag:
+            counts = saver.retag_library(dry_run=args.dry_run)
+            print(f"Scanned {counts['scanned']} files: {counts['changed']} {'to change' if args.dry_run else 'changed'}, "
+                  f"{counts['unchanged']} unchanged, {counts['unreadable']} unreadable, "
+                  f"{counts['failed']} failed.")
+            return
+        if args.resume:
+            youtube_urls = [job['url'] for job in saver.journal.unfinished() if job['url'] not in youtube_urls] + youtube_urls
+            if not youtube_urls:
+                print("No unfinished jobs to resume.")
+                return
+        if len(youtube_urls) == 1 and not args.batch_file and not args.resume and not saver.downloader.is_playlist_url(youtube_urls[0]):
+            saver.save_youtube_to_spotify_local(youtube_urls[0])
+            return
+
+        results = saver.save_batch(youtube_urls)
+    finally:
+        saver.close()
+    if not all(r['success'] for r in results):
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,117 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+
+class MetadataCache:
+    """
+    On-disk SQLite cache of LLM-inferred metadata, keyed by normalized YouTube title,
+    LLM provider and model. Safe to share between worker threads.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 50000, max_age_days: float = 180, bypass: bool = False):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 86400 if max_age_days else None
+        self.bypass = bypass # Skip lookups but still store fresh results
+        self.hits = 0
+        self.misses = 0
+        self._puts_since_evict = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS metadata ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_metadata_accessed ON metadata(accessed_at)")
+        self._conn.commit()
+        self.evict()
+
+    @staticmethod
+    def normalize_title(youtube_title: str) -> str:
+        """
+        Case-folds, applies NFKC and collapses whitespace so trivially different uploads share an entry.
+        """
+        title = unicodedata.normalize('NFKC', youtube_title).casefold()
+        return re.sub(r'\s+', ' ', title).strip()
+
+    def _key(self, youtube_title: str, llm_provider: str, model: str) -> str:
+        return f"{llm_provider.lower()}\x1f{model}\x1f{self.normalize_title(youtube_title)}"
+
+    def get(self, youtube_title: str, llm_provider: str, model: str) -> dict | None:
+        return self.get_any(youtube_title, [(llm_provider, model)])
+
+    def get_any(self, youtube_title: str, providers: list[tuple[str, str]]) -> dict | None:
+        """
+        Returns the first entry found under the (provider, model) pairs, in order.
+        Counts one hit or miss for the whole lookup.
+        """
+        if self.bypass:
+            return None
+        now = time.time()
+        with self._lock:
+            for llm_provider, model in providers:
+                key = self._key(youtube_title, llm_provider, model)
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM metadata WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not (self.max_age_seconds and now - row[1] > self.max_age_seconds):
+                    break
+            else:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE metadata SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, youtube_title: str, llm_provider: str, model: str, metadata: dict):
+        key = self._key(youtube_title, llm_provider, model)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(metadata), now, now)
+            )
+            self._conn.commit()
+            self._puts_since_evict += 1
+            should_evict = self._puts_since_evict >= 100
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        """
+        Drops entries older than max_age_days, then the least recently used ones beyond max_entries.
+        """
+        with self._lock:
+            self._puts_since_evict = 0
+            if self.max_age_seconds:
+                self._conn.execute(
+                    "DELETE FROM metadata WHERE created_at < ?", (time.time() - self.max_age_seconds,)
+                )
+            if self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM metadata WHERE key IN ("
+                    " SELECT key FROM metadata ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
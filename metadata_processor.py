@@ -1,45 +1,105 @@
+import contextvars
 import os
-import requests
+import json
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from PIL import Image
 
-from openai import OpenAI
-from anthropic import Anthropic
-import google.generativeai as genai
+from metadata_cache import MetadataCache
+from album_art_cache import AlbumArtCache
+from http_client import fetch_bytes
+from llm_providers import create_provider
+from llm_router import LLMRouter, LLMUnavailableError, ProviderLimiter
+from metrics import metrics
+from title_parser import TitleParser
 
-from mutagen.mp3 import MP3
-from mutagen.id3 import ID3NoHeaderError, ID3, TIT2, TPE1, APIC
-# TCON (genre), TDRC (date) are imported but not used in this version.
+# Shared by the single-title and batched prompts so both extract metadata the same way.
+TITLE_RULES = (
+    "For the 'title' field, remove any extraneous details such as 'Official Music Video', 'Official Visualizer', "
+    "'Lyric Video', 'Audio', '4K', 'HD', 'Explicit', 'Remix', 'Live', 'Official Stream', 'Full Album', 'Mixtape', "
+    "year numbers (e.g., '(2023)' or '[2023]'), or any text within parentheses or brackets that describes the video type "
+    "or quality. Focus on the core song name. "
+    "For the 'artist' field, identify the primary artist(s). If there are featured artists (e.g., 'ft.', 'feat.'), "
+    "keep them as part of the 'title' field and *do not* include them in the 'artist' field unless they are a primary artist. "
+)
 
 
 class MetadataProcessor:
-    def __init__(self, llm_provider: str, api_key: str):
+    def __init__(self, llm_provider: str, api_key: str, cache: MetadataCache = None, batch_size: int = 20,
+                 title_parser_threshold: float = 0.85, album_art_cache: AlbumArtCache = None,
+                 max_cover_size: int = None, max_image_bytes: int = 10 * 1024 * 1024, retry_options: dict = None,
+                 fallback_providers: dict[str, str] = None, llm_timeout: float = None, rate_limits: dict[str, float] = None,
+                 max_llm_concurrency: int = 4, hedge_percentile: float = None, hedge_min_samples: int = 20):
         self.llm_provider = llm_provider.lower()
-        if self.llm_provider == "openai":
-            self.llm_client = OpenAI(api_key=api_key)
-            self.model = "gpt-4o" # Or "gpt-3.5-turbo"
-        elif self.llm_provider == "claude":
-            self.llm_client = Anthropic(api_key=api_key)
-            self.model = "claude-3-opus-20240229" # Or other Claude models
-        elif self.llm_provider == "gemini":
-            genai.configure(api_key=api_key)
-            self.llm_client = genai.GenerativeModel('gemini-1.5-pro') # Or 'gemini-1.5-flash', etc.
-            self.model = 'gemini-1.5-pro'
-        else:
-            raise ValueError(f"Unsupported LLM provider: {llm_provider}")
+        self.cache = cache
+        self.batch_size = batch_size
+        self.title_parser = TitleParser()
+        self.title_parser_threshold = title_parser_threshold
+        self.album_art_cache = album_art_cache
+        self.max_cover_size = max_cover_size # Longest edge in pixels; None keeps the original size
+        self.max_image_bytes = max_image_bytes
+        self.retry_options = retry_options or {} # Passed to retry_call for transient LLM errors
+        self.max_llm_concurrency = max_llm_concurrency
+
+        # The primary provider first, then any fallbacks in order; each imports only its own SDK
+        api_keys = {self.llm_provider: api_key}
+        api_keys.update({name.lower(): key for name, key in (fallback_providers or {}).items()})
+        providers = [create_provider(name, key, timeout=llm_timeout) for name, key in api_keys.items()]
+        limiters = {
+            provider.name: ProviderLimiter((rate_limits or {}).get(provider.name, 2.0), max_llm_concurrency)
+            for provider in providers
+        }
+        self.router = LLMRouter(providers, limiters, retry_options=self.retry_options,
+                                hedge_percentile=hedge_percentile, hedge_min_samples=hedge_min_samples)
+        self.model = providers[0].model
+
+    def infer_metadata(self, youtube_title: str, uploader: str = None) -> dict:
+        """
+        Infers Title and Artist, trying the local rule-based parser first and only calling
+        the LLM when the parse is below title_parser_threshold confidence.
+        """
+        parsed = self._parse_title_locally(youtube_title, uploader)
+        if parsed:
+            return parsed
+        return self.infer_metadata_with_llm(youtube_title)
+
+    def _parse_title_locally(self, youtube_title: str, uploader: str = None) -> dict | None:
+        parsed = self.title_parser.parse(youtube_title, uploader)
+        if parsed['confidence'] < self.title_parser_threshold:
+            return None
+        print(f"Parsed '{youtube_title}' locally (confidence {parsed['confidence']:.2f}), skipping LLM.")
+        return {'title': parsed['title'], 'artist': parsed['artist']}
 
     def infer_metadata_with_llm(self, youtube_title: str) -> dict:
         """
         Uses an LLM to infer accurate Title and Artist from a YouTube video title.
+        Results are served from / stored in the metadata cache when one is configured.
+        Raises LLMUnavailableError when no provider in the chain gives a usable answer, rather than
+        tagging the track with an 'Unknown' artist.
+        """
+        cached = self._cache_get(youtube_title)
+        if cached:
+            print(f"Metadata cache hit for '{youtube_title}'")
+            return cached
+
+        metadata, provider = self._query_llm(youtube_title)
+        if self.cache:
+            self.cache.put(youtube_title, provider.name, provider.model, metadata)
+        return metadata
+
+    def _cache_get(self, youtube_title: str) -> dict | None:
         """
-        prompt = (
+        Looks the title up under every provider in the chain, since a fallback may have answered it.
+        """
+        if not self.cache:
+            return None
+        cached = self.cache.get_any(youtube_title, [(provider.name, provider.model) for provider in self.router.providers])
+        metrics.increment('cache_requests_total', stage='metadata', result='hit' if cached else 'miss')
+        return cached
+
+    def _build_prompt(self, youtube_title: str) -> str:
+        return (
             f"Given the YouTube video title '{youtube_title}', please extract the most likely song title and artist. "
-            "For the 'title' field, remove any extraneous details such as 'Official Music Video', 'Official Visualizer', "
-            "'Lyric Video', 'Audio', '4K', 'HD', 'Explicit', 'Remix', 'Live', 'Official Stream', 'Full Album', 'Mixtape', "
-            "year numbers (e.g., '(2023)' or '[2023]'), or any text within parentheses or brackets that describes the video type "
-            "or quality. Focus on the core song name. "
-            "For the 'artist' field, identify the primary artist(s). If there are featured artists (e.g., 'ft.', 'feat.'), "
-            "keep them as part of the 'title' field and *do not* include them in the 'artist' field unless they are a primary artist. "
+            + TITLE_RULES +
             "Return the response as a JSON object with 'title' and 'artist' keys. "
             "If no clear artist or title is present after cleaning, use the original YouTube title for 'title' and 'Unknown' for 'artist'.\n\n"
             "Examples:\n"
@@ -55,179 +115,261 @@ class MetadataProcessor:
             "Output: {{'title': 'Song Title', 'artist': 'Artist Name'}}\n\n"
             f"Input: '{youtube_title}'"
         )
+
+    def _query_llm(self, youtube_title: str) -> tuple[dict, object]:
+        """
+        Asks the provider chain about a single title. Returns (cleaned metadata, provider that answered).
+        Raises LLMUnavailableError if every provider fails or answers with unusable JSON.
+        """
+        return self.router.query(self._build_prompt(youtube_title), self._parse_response, description="LLM call")
+
+    def _parse_response(self, content: str) -> dict:
         try:
-            import json # Import json locally as it's only used here
-            if self.llm_provider == "openai":
-                response = self.llm_client.chat.completions.create(
-                    model=self.model,
-                    messages=[{"role": "user", "content": prompt}],
-                    response_format={"type": "json_object"}
-                )
-                content = response.choices[0].message.content
-            elif self.llm_provider == "claude":
-                response = self.llm_client.messages.create(
-                    model=self.model,
-                    max_tokens=500,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                content = response.content[0].text # Claude returns a list of content blocks
-            elif self.llm_provider == "gemini":
-                response = self.llm_client.generate_content(
-                    prompt,
-                    generation_config=genai.types.GenerationConfig(response_mime_type="application/json")
-                )
-                content = response.text # Gemini text attribute for generated content
-
-            if not isinstance(content, str):
-                print(f"Warning: LLM response content is not a string: {content}")
-                content = str(content)
-
-            # Attempt to parse JSON
-            try:
-                metadata = json.loads(content)
-                if 'title' not in metadata or 'artist' not in metadata:
-                    raise ValueError("LLM response missing 'title' or 'artist' keys.")
-                metadata['title'] = self._clean_title_post_llm(metadata['title'])
-                return metadata
-            except json.JSONDecodeError as e:
-                print(f"Error parsing LLM JSON response: {e}. Raw content: {content}")
-                # Fallback if LLM doesn't return perfect JSON
-                return {"title": youtube_title, "artist": "Unknown"}
-        except Exception as e:
-            print(f"Error calling LLM for metadata inference: {e}")
-            return {"title": youtube_title, "artist": "Unknown"}
-    
-    def _clean_title_post_llm(self, title: str) -> str:
+            metadata = json.loads(content)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Error parsing LLM JSON response: {e}. Raw content: {content}")
+        if not isinstance(metadata, dict) or 'title' not in metadata or 'artist' not in metadata:
+            raise ValueError("LLM response missing 'title' or 'artist' keys.")
+        metadata['title'] = self._clean_title_post_llm(metadata['title'])
+        return metadata
+
+    def infer_metadata_batch(self, youtube_titles: list[str], max_retries: int = 2, fallback: bool = False) -> list[dict | None]:
         """
-        Applies a final cleanup to the title after LLM inference to remove common extraneous phrases.
+        Infers Title and Artist for many YouTube titles, packing up to batch_size titles into each LLM request.
+        Up to max_llm_concurrency requests are in flight at once; the provider limiters still apply.
+        Titles the rule-based parser handles confidently and cached titles never reach the LLM; entries the LLM fails to return or that don't validate
+        are retried (only those entries) up to max_retries times.
+        Returns one metadata dict per input title, in order. Titles that could not be resolved get None,
+        or {'title': youtube_title, 'artist': 'Unknown'} when fallback is True.
         """
-        # Define common patterns to remove (case-insensitive)
-        patterns_to_remove = [
-            r'\(?\s*(official\s*(music|lyric|visual)?\s*(video|audio|visualizer|stream))?\s*\)?',
-            r'\[?\s*(official\s*(music|lyric|visual)?\s*(video|audio|visualizer|stream))?\s*\]?',
-            r'\(?\s*(\d{4}|hd|4k|explicit|remix|live|full\s*album|mixtape)\s*\)?',
-            r'\[?\s*(\d{4}|hd|4k|explicit|remix|live|full\s*album|mixtape)\s*\]?',
-            r'\s*-\s*official\s*audio', # Specific edge case like "Song - Official Audio"
-            r'\s*-\s*official\s*video',
-            r'\s*\(?\s*(stream|version|lyrics?|clean|dirty|hq|full|uncensored)\s*\)?',
-            r'\s*\[?\s*(stream|version|lyrics?|clean|dirty|hq|full|uncensored)\s*\]?',
-            r'\s*\(?\s*ft\.?\s*.*\s*\)?', # If LLM leaves ft. in title, strip it
-            r'\s*\[?\s*ft\.?\s*.*\s*\]?'
-        ]
+        resolved = {}
+        pending = []
+        for youtube_title in dict.fromkeys(youtube_titles): # Dedupe, keep order
+            parsed = self.title_parser.parse(youtube_title)
+            if parsed['confidence'] >= self.title_parser_threshold:
+                resolved[youtube_title] = {'title': parsed['title'], 'artist': parsed['artist']}
+                continue
+            cached = self._cache_get(youtube_title)
+            if cached:
+                resolved[youtube_title] = cached
+            else:
+                pending.append(youtube_title)
+
+        if resolved:
+            print(f"Resolved {len(resolved)} of {len(resolved) + len(pending)} unique titles locally or from cache.")
 
-        cleaned_title = title
-        for pattern in patterns_to_remove:
-            cleaned_title = re.sub(pattern, '', cleaned_title, flags=re.IGNORECASE).strip()
+        for attempt in range(max_retries + 1):
+            if not pending:
+                break
+            if attempt:
+                print(f"Retrying {len(pending)} titles that failed to parse (attempt {attempt + 1}).")
+            failed = []
+            chunks = [pending[start:start + self.batch_size] for start in range(0, len(pending), self.batch_size)]
+            with ThreadPoolExecutor(max_workers=min(len(chunks), self.max_llm_concurrency)) as executor:
+                # Each request's metrics spans stay attributed to the caller's track
+                futures = [executor.submit(contextvars.copy_context().run, self._query_llm_batch, chunk) for chunk in chunks]
+                answers = [future.result() for future in futures]
+            for chunk, (chunk_results, provider) in zip(chunks, answers):
+                for youtube_title, metadata in zip(chunk, chunk_results):
+                    if metadata is None:
+                        failed.append(youtube_title)
+                        continue
+                    resolved[youtube_title] = metadata
+                    if self.cache:
+                        self.cache.put(youtube_title, provider.name, provider.model, metadata)
+            pending = failed
 
-        cleaned_title = re.sub(r'^[-\s\W]+|[-\s\W]+$', '', cleaned_title)
+        if pending:
+            print(f"Warning: Could not infer metadata for {len(pending)} titles.")
 
-        return cleaned_title.strip() # Final strip
+        results = []
+        for youtube_title in youtube_titles:
+            metadata = resolved.get(youtube_title)
+            if metadata is None and fallback:
+                metadata = {"title": youtube_title, "artist": "Unknown"}
+            results.append(metadata)
+        return results
 
-    def set_audio_metadata(self, file_path: str, title: str, artist: str, album_art_url: str = None):
+    def _build_batch_prompt(self, youtube_titles: list[str]) -> str:
+        numbered = "\n".join(f"{i}: {json.dumps(t, ensure_ascii=False)}" for i, t in enumerate(youtube_titles))
+        return (
+            "For each of the numbered YouTube video titles below, extract the most likely song title and artist. "
+            + TITLE_RULES +
+            "If no clear artist or title is present after cleaning, use the original YouTube title for 'title' and 'Unknown' for 'artist'. "
+            "Return a JSON object of the form {\"results\": [{\"index\": <number>, \"title\": <string>, \"artist\": <string>}, ...]} "
+            "with exactly one entry per input title, using the input's number as 'index'.\n\n"
+            "Example:\n"
+            "Input:\n"
+            "0: \"Playboi Carti - WASSUP/RATCHET ft. Lil Baby (Official Visualizer)\"\n"
+            "1: \"Artist Name - Song Title (Lyric Video) [Explicit]\"\n"
+            "Output: {\"results\": [{\"index\": 0, \"title\": \"WASSUP/RATCHET ft. Lil Baby\", \"artist\": \"Playboi Carti\"}, "
+            "{\"index\": 1, \"title\": \"Song Title\", \"artist\": \"Artist Name\"}]}\n\n"
+            f"Input:\n{numbered}"
+        )
+
+    def _query_llm_batch(self, youtube_titles: list[str]) -> tuple[list[dict | None], object]:
         """
-        Sets ID3 tags for MP3 files.
+        Sends one LLM request for several titles through the provider chain. Returns a list aligned with
+        youtube_titles holding the validated metadata, or None for entries that were missing or malformed,
+        plus the provider that answered (None if all of them failed).
         """
         try:
-            audio = MP3(file_path, ID3=ID3)
-        except ID3NoHeaderError:
-            audio = MP3(file_path)
-            audio.add_tags()
-            audio.save()
-            audio = MP3(file_path, ID3=ID3)
-
-        tags = audio.tags
-
-        if tags is None:
-            audio.add_tags()
-            tags = audio.tags
-
-        tags.clear()
-
-        tags.add(TIT2(encoding=3, text=[title])) # Title (TIT2)
-        tags.add(TPE1(encoding=3, text=[artist])) # Artist (TPE1)
-
-        if album_art_url:
-            image_data, image_format = self._fetch_and_process_image(album_art_url)
-            if image_data:
-                tags.add(
-                    APIC(
-                        encoding=3,  # UTF-8
-                        mime=image_format,  # image/jpeg or image/png
-                        type=3,  # 3 is for Front Cover
-                        desc='Cover',
-                        data=image_data
-                    )
-                )
+            # Roughly 60 output tokens per entry plus JSON framing
+            return self.router.query(
+                self._build_batch_prompt(youtube_titles),
+                lambda content: self._parse_batch_response(content, youtube_titles),
+                max_tokens=100 + 60 * len(youtube_titles), description="batched LLM call"
+            )
+        except LLMUnavailableError as e:
+            print(f"Error calling LLM for batch metadata inference: {e}")
+            return [None] * len(youtube_titles), None
+
+    def _parse_batch_response(self, content: str, youtube_titles: list[str]) -> list[dict | None]:
+        """
+        Raises ValueError if the answer has no usable entries at all, so the next provider gets a turn.
+        """
         try:
-            tags.save(v2_version=3) # Save with ID3v2.3 for broader compatibility
+            parsed = json.loads(content)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Error parsing LLM batch JSON response: {e}. Raw content: {content}")
+
+        entries = parsed.get('results') if isinstance(parsed, dict) else parsed
+        if not isinstance(entries, list):
+            raise ValueError(f"LLM batch response has no 'results' array. Raw content: {content}")
+
+        results = [None] * len(youtube_titles)
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            index = entry.get('index')
+            title = entry.get('title')
+            artist = entry.get('artist')
+            if not isinstance(index, int) or not 0 <= index < len(youtube_titles):
+                continue
+            if not isinstance(title, str) or not isinstance(artist, str) or not title.strip():
+                continue
+            results[index] = {'title': self._clean_title_post_llm(title), 'artist': artist.strip()}
+        if not any(results):
+            raise ValueError(f"LLM batch response has no usable entries. Raw content: {content}")
+        return results
+
+    def _clean_title_post_llm(self, title: str) -> str:
+        """
+        Applies a final cleanup to the title after LLM inference to remove common extraneous phrases.
+        """
+        return TitleParser.clean_title(title)
+
+    def set_audio_metadata(self, file_path: str, title: str, artist: str, album_art_url: str = None,
+                           album_art: tuple[bytes | None, str | None] = None, source: dict = None):
+        """
+        Sets title, artist and cover art tags. MP3 files get ID3 tags, M4A/MP4 files get MP4 atoms,
+        and Opus/Ogg/FLAC files get Vorbis comments.
+        album_art optionally passes an already fetched (image_data, mime_type) pair, in which case
+        album_art_url is not fetched again. source optionally records the YouTube 'video_id', 'url'
+        and 'title' in the file so the library can be re-indexed later.
+        Raises if the file can't be tagged, so an untagged file is never treated as finished.
+        """
+        import audio_tags # Deferred: mutagen is only needed once a file is tagged
+        if not audio_tags.is_supported(file_path):
+            raise ValueError(f"Tagging '{os.path.splitext(file_path)[1]}' files is not supported; '{file_path}' was left untagged.")
+
+        if album_art is None and album_art_url:
+            album_art = self._fetch_and_process_image(album_art_url)
+        image_data, image_format = album_art if album_art else (None, None)
+
+        with metrics.span('tag_write', format=os.path.splitext(file_path)[1].lstrip('.').lower()) as span:
+            try:
+                audio_tags.write_tags(file_path, title, artist, image_data, image_format, source)
+            except Exception as e:
+                print(f"Error saving metadata to {file_path}: {e}")
+                raise
+            span['bytes'] = len(image_data) if image_data else None
             print(f"Metadata set for '{file_path}': Title='{title}', Artist='{artist}'")
-        except Exception as e:
-            print(f"Error saving metadata to {file_path}: {e}")
+
+    def fetch_album_art(self, album_art_url: str) -> tuple[bytes | None, str | None]:
+        """
+        Fetches and processes album art ahead of tagging, so it can run while the audio downloads.
+        """
+        return self._fetch_and_process_image(album_art_url)
 
     def _fetch_and_process_image(self, album_art_url: str) -> tuple[bytes | None, str | None]:
         """
         Fetches image data from a URL and processes it for embedding.
         Returns (image_data_bytes, mime_type) or (None, None) on failure.
+        Recorded as an 'art_fetch' span with the downloaded byte count and whether the cache served it.
         """
         if not album_art_url:
             return None, None
 
-        try:
-            response = requests.get(album_art_url)
-            response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
-            image_data = response.content
-
-            img_byte_arr = BytesIO()
-            img_format = None
+        import requests # Deferred along with http_client's session until art is actually fetched
+        with metrics.span('art_fetch') as span:
+            variant = f"max{self.max_cover_size or 0}"
+            if self.album_art_cache:
+                cached = self.album_art_cache.get_by_url(album_art_url, variant)
+                span['cache_hit'] = bool(cached)
+                if cached:
+                    return cached
 
             try:
-                img = Image.open(BytesIO(image_data))
-                if img.mode != 'RGB':
-                    # Convert to RGB for broader compatibility
-                    img = img.convert('RGB')
-
-                # Determine the original image format and save accordingly, or default to JPEG
-                if img.format == 'PNG':
-                    img.save(img_byte_arr, format='png')
-                    img_format = 'image/png'
-                else: # Default to JPEG
-                    img.save(img_byte_arr, format='jpeg')
-                    img_format = 'image/jpeg'
-
-                return img_byte_arr.getvalue(), img_format
-            except Exception as img_e:
-                print(f"Warning: Could not process image data from '{album_art_url}' for album art: {img_e}")
+                image_data = fetch_bytes(album_art_url, max_bytes=self.max_image_bytes)
+                span['bytes'] = len(image_data)
+
+                content_key = None
+                if self.album_art_cache:
+                    # Same artwork behind a different URL: reuse the processed copy
+                    content_key = AlbumArtCache.content_key(image_data, variant)
+                    cached = self.album_art_cache.get_by_content(content_key)
+                    if cached:
+                        span['cache_hit'] = True
+                        self.album_art_cache.put(album_art_url, variant, content_key, *cached)
+                        return cached
+
+                try:
+                    processed = self._process_image(image_data)
+                except Exception as img_e:
+                    span['error'] = f"{type(img_e).__name__}: {img_e}"
+                    print(f"Warning: Could not process image data from '{album_art_url}' for album art: {img_e}")
+                    return None, None
+
+                if self.album_art_cache:
+                    self.album_art_cache.put(album_art_url, variant, content_key, *processed)
+                return processed
+            except requests.exceptions.RequestException as e:
+                span['error'] = f"{type(e).__name__}: {e}"
+                print(f"Error fetching album art from '{album_art_url}': {e}")
+                return None, None
+            except Exception as e:
+                span['error'] = f"{type(e).__name__}: {e}"
+                print(f"An unexpected error occurred while fetching/processing album art from '{album_art_url}': {e}")
                 return None, None
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching album art from '{album_art_url}': {e}")
-            return None, None
-        except Exception as e:
-            print(f"An unexpected error occurred while fetching/processing album art from '{album_art_url}': {e}")
-            return None, None
 
+    def close(self):
+        self.router.close()
 
-    def extract_youtube_title_and_thumbnail(self, youtube_url: str) -> tuple[str, str]:
+    def _process_image(self, image_data: bytes) -> tuple[bytes, str]:
         """
-        Extracts the YouTube video title and a high-quality thumbnail URL using yt-dlp.
+        Prepares raw image bytes for embedding. JPEG and PNG images that already fit within
+        max_cover_size are embedded untouched; anything else is decoded, downscaled and re-encoded.
         """
-        import yt_dlp # Import locally as it's only used here
-        ydl_opts = {
-            'quiet': True,
-            'extract_flat': True, # Only extract info, don't download
-            'force_generic_extractor': True,
-        }
-        try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info_dict = ydl.extract_info(youtube_url, download=False)
-                title = info_dict.get('title', 'Unknown Title')
-                thumbnails = info_dict.get('thumbnails', [])
-                # Find the largest thumbnail
-                thumbnail_url = None
-                if thumbnails:
-                    largest_thumbnail = sorted(thumbnails, key=lambda x: x.get('width', 0) * x.get('height', 0), reverse=True)
-                    if largest_thumbnail:
-                        thumbnail_url = largest_thumbnail[0].get('url')
-                return title, thumbnail_url
-        except Exception as e:
-            print(f"Error extracting YouTube info: {e}")
-            return "Unknown Title", None
\ No newline at end of file
+        from PIL import Image # Deferred: Pillow is only needed for album art
+        img = Image.open(BytesIO(image_data)) # Only reads the header; pixels are decoded on demand
+        fits = not self.max_cover_size or max(img.size) <= self.max_cover_size
+        if fits and img.format == 'JPEG':
+            return image_data, 'image/jpeg'
+        if fits and img.format == 'PNG':
+            return image_data, 'image/png'
+
+        source_format = img.format
+        if img.mode != 'RGB':
+            # Convert to RGB for broader compatibility
+            img = img.convert('RGB')
+        if self.max_cover_size:
+            img.thumbnail((self.max_cover_size, self.max_cover_size), Image.LANCZOS)
+
+        img_byte_arr = BytesIO()
+        # Determine the original image format and save accordingly, or default to JPEG
+        if source_format == 'PNG':
+            img.save(img_byte_arr, format='png', optimize=True)
+            return img_byte_arr.getvalue(), 'image/png'
+        img.save(img_byte_arr, format='jpeg', quality=90)
+        return img_byte_arr.getvalue(), 'image/jpeg'
@@ -0,0 +1,159 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency histogram buckets in seconds, spanning fast cache hits to slow downloads/transcodes
+_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+_PREFIX = "yt2spotify"
+
+_current_track = contextvars.ContextVar('current_track', default=None)
+
+
+class Metrics:
+    """
+    Per-stage timing spans for the pipeline (extract, download, transcode, llm, art_fetch, tag_write, track).
+    Each span is written as one JSON line when a JSONL path is configured, and aggregated into
+    Prometheus text-format metrics (latency histograms, errors, bytes, LLM tokens, cache hits).
+    Safe to use from worker threads.
+    """
+
+    def __init__(self):
+        self.jsonl_path = None
+        self.prometheus_path = None
+        self._jsonl_file = None
+        self._lock = threading.Lock()
+        self._durations = {} # stage -> {'count', 'sum', 'buckets'}
+        self._counters = {} # (name, labels tuple) -> value
+
+    def configure(self, jsonl_path: str = None, prometheus_path: str = None):
+        with self._lock:
+            if self._jsonl_file:
+                self._jsonl_file.close()
+                self._jsonl_file = None
+            self.jsonl_path = jsonl_path
+            self.prometheus_path = prometheus_path
+            if jsonl_path:
+                os.makedirs(os.path.dirname(os.path.abspath(jsonl_path)), exist_ok=True)
+                self._jsonl_file = open(jsonl_path, 'a', encoding='utf-8', buffering=1)
+
+    @contextmanager
+    def track(self, url: str):
+        """
+        Tags every span recorded inside the block (including stage-pool work submitted with
+        contextvars.copy_context) with the URL being processed.
+        """
+        token = _current_track.set(url)
+        try:
+            yield
+        finally:
+            _current_track.reset(token)
+
+    @contextmanager
+    def span(self, stage: str, **attrs):
+        """
+        Times a block as one stage. Yields a dict the block can add attributes to, e.g. 'bytes',
+        'input_tokens', 'output_tokens', 'cache_hit' or 'error'. An escaping exception is recorded as the error.
+        """
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs.setdefault('error', f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - start, started_at=started, **attrs)
+
+    def record(self, stage: str, duration: float, started_at: float = None, **attrs):
+        """
+        Records a stage that was timed elsewhere (e.g. from a yt-dlp postprocessor hook).
+        """
+        event = {
+            'ts': round(started_at if started_at is not None else time.time() - duration, 3),
+            'stage': stage,
+            'duration_s': round(duration, 4),
+            'ok': not attrs.get('error'),
+        }
+        if _current_track.get() and 'url' not in attrs:
+            event['url'] = _current_track.get()
+        event.update({k: v for k, v in attrs.items() if v is not None})
+
+        with self._lock:
+            stats = self._durations.setdefault(stage, {'count': 0, 'sum': 0.0, 'buckets': [0] * len(_BUCKETS)})
+            stats['count'] += 1
+            stats['sum'] += duration
+            for i, bound in enumerate(_BUCKETS):
+                if duration <= bound:
+                    stats['buckets'][i] += 1
+            if attrs.get('error'):
+                self._add('stage_errors_total', 1, stage=stage)
+            if attrs.get('bytes'):
+                self._add('stage_bytes_total', attrs['bytes'], stage=stage)
+            for kind in ('input_tokens', 'output_tokens'):
+                if attrs.get(kind):
+                    self._add('llm_tokens_total', attrs[kind], provider=attrs.get('provider', ''), kind=kind.split('_')[0])
+            if attrs.get('cache_hit') is not None:
+                self._add('cache_requests_total', 1, stage=stage, result='hit' if attrs['cache_hit'] else 'miss')
+            if self._jsonl_file:
+                self._jsonl_file.write(json.dumps(event, default=str) + "\n")
+
+    def increment(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self._add(name, value, **labels)
+
+    def _add(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            lines.append(f"# HELP {_PREFIX}_stage_duration_seconds Time spent in each pipeline stage.")
+            lines.append(f"# TYPE {_PREFIX}_stage_duration_seconds histogram")
+            for stage, stats in sorted(self._durations.items()):
+                for bound, count in zip(_BUCKETS, stats['buckets']):
+                    lines.append(f'{_PREFIX}_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'{_PREFIX}_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {stats["count"]}')
+                lines.append(f'{_PREFIX}_stage_duration_seconds_sum{{stage="{stage}"}} {stats["sum"]:.6f}')
+                lines.append(f'{_PREFIX}_stage_duration_seconds_count{{stage="{stage}"}} {stats["count"]}')
+
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {_PREFIX}_{name} counter")
+                    typed.add(name)
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f"{_PREFIX}_{name}{{{label_text}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self):
+        """
+        Atomically rewrites the Prometheus text file (for node_exporter's textfile collector or similar).
+        """
+        if not self.prometheus_path:
+            return
+        tmp_path = f"{self.prometheus_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.render_prometheus())
+            os.replace(tmp_path, self.prometheus_path)
+        except OSError as e:
+            print(f"Warning: Could not write metrics to {self.prometheus_path}: {e}")
+
+    def close(self):
+        self.write_prometheus()
+        with self._lock:
+            if self._jsonl_file:
+                self._jsonl_file.close()
+                self._jsonl_file = None
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Process-wide instance used by the pipeline modules
+metrics = Metrics()
@@ -1,58 +1,371 @@
+import contextvars
 import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from config import Config
 from youtube_downloader import YouTubeDownloader
 from metadata_processor import MetadataProcessor
+from metadata_cache import MetadataCache
+from info_cache import InfoCache
+from album_art_cache import AlbumArtCache
+from library_index import LibraryIndex
+from job_journal import JobJournal
+from retagger import Retagger
+from retry import retry_call
+from metrics import metrics
 import shutil
 
 class Orchestrator:
-    def __init__(self, llm_provider: str, output_dir: str = None):
+    def __init__(self, llm_provider: str, output_dir: str = None, max_workers: int = None,
+                 use_cache: bool = True, bypass_cache: bool = False, title_parser_threshold: float = None,
+                 concurrent_stages: bool = True, max_cover_size: int = None, audio_format: str = None,
+                 skip_existing: bool = True, quiet: bool = False, llm_fallback: list[str] = None,
+                 llm_timeout: float = None, hedge_percentile: float = None):
         self.config = Config()
         self.llm_provider = llm_provider
         self.api_key = self.config.get_llm_api_key(llm_provider)
         self.output_dir = output_dir if output_dir else self.config.default_output_dir
         self.config.ensure_output_dir_exists(self.output_dir)
+        self.max_workers = max_workers if max_workers else self.config.default_concurrency
+        self.concurrent_stages = concurrent_stages
+        self.skip_existing = skip_existing
+        self.library_index = LibraryIndex(self.output_dir)
+        self.journal = JobJournal(self.output_dir)
+        self.retry_options = {
+            'attempts': self.config.retry_attempts,
+            'base_delay': self.config.retry_base_delay,
+            'max_delay': self.config.retry_max_delay,
+        }
+        # Each in-flight track can have its LLM call and album art fetch running beside its download
+        self._stage_executor = ThreadPoolExecutor(max_workers=2 * self.max_workers, thread_name_prefix="stage")
+        self._video_locks = {} # video -> [lock, users], so daemon jobs for the same video run one after another
+        self._video_locks_lock = threading.Lock()
 
-        self.downloader = YouTubeDownloader(output_dir=self.output_dir)
-        self.metadata_processor = MetadataProcessor(llm_provider=llm_provider, api_key=self.api_key)
+        self.metadata_cache = None
+        info_cache = None
+        album_art_cache = None
+        if use_cache:
+            info_cache = InfoCache(self.config.info_cache_dir, max_age_seconds=self.config.info_cache_max_age_seconds)
+            album_art_cache = AlbumArtCache(self.config.album_art_cache_dir,
+                                            max_age_days=self.config.album_art_cache_max_age_days,
+                                            max_bytes=self.config.album_art_cache_max_bytes)
+            self.metadata_cache = MetadataCache(
+                self.config.metadata_cache_path,
+                max_entries=self.config.metadata_cache_max_entries,
+                max_age_days=self.config.metadata_cache_max_age_days,
+                bypass=bypass_cache
+            )
+        self.downloader = YouTubeDownloader(
+            output_dir=self.output_dir, info_cache=info_cache,
+            audio_format=audio_format if audio_format else self.config.default_audio_format,
+            quiet=quiet, staging_dir=self.config.staging_dir_for(self.output_dir)
+        )
+        self.downloader.prune_staging(self.config.staging_max_age_days * 86400)
+        if use_cache:
+            info_cache.prune()
+            album_art_cache.prune()
+        self.metadata_processor = MetadataProcessor(
+            llm_provider=llm_provider, api_key=self.api_key, cache=self.metadata_cache,
+            batch_size=self.config.llm_batch_size,
+            title_parser_threshold=(title_parser_threshold if title_parser_threshold is not None
+                                    else self.config.title_parser_threshold),
+            album_art_cache=album_art_cache,
+            max_cover_size=(max_cover_size if max_cover_size is not None else self.config.max_cover_size) or None,
+            max_image_bytes=self.config.max_image_bytes,
+            retry_options=self.retry_options,
+            fallback_providers={name: self.config.get_llm_api_key(name) for name in llm_fallback or []},
+            llm_timeout=llm_timeout if llm_timeout is not None else self.config.llm_request_timeout,
+            rate_limits=self.config.llm_rate_limits,
+            max_llm_concurrency=self.config.llm_max_concurrency,
+            hedge_percentile=hedge_percentile,
+            hedge_min_samples=self.config.llm_hedge_min_samples
+        )
 
-    def save_youtube_to_spotify_local(self, youtube_url: str):
+    def save_youtube_to_spotify_local(self, youtube_url: str) -> str | None:
+        """
+        Runs the full pipeline for a single URL.
+        Returns the saved file path, or None if the process failed.
+        """
         print(f"Starting process for YouTube URL: {youtube_url}")
-        downloaded_file_path = None
         try:
-            # 1. Extract YouTube info (title and thumbnail for LLM and art)
-            youtube_title, thumbnail_url = self.metadata_processor.extract_youtube_title_and_thumbnail(youtube_url)
-            if not youtube_title:
-                raise ValueError("Could not extract YouTube title.")
+            downloaded_file_path = self._process_url(youtube_url)
+
+            # Note: Spotify needs time to pick up new files.
+            print("\nProcess complete!")
+            print(f"File saved to: {downloaded_file_path}")
+            print("Please open Spotify, navigate to 'Local Files', and the new track should appear shortly.")
+            print("You might need to restart Spotify or wait a few minutes for it to rescan.")
+            return downloaded_file_path
+
+        except Exception as e:
+            print(f"\nAn error occurred during the process: {e}")
+            print("Please ensure your API key is correct and the YouTube URL is valid.")
+            return None
+
+    def save_batch(self, youtube_urls: list[str], max_workers: int = None) -> list[dict]:
+        """
+        Runs the pipeline for many URLs through a bounded worker pool.
+        Playlist URLs are expanded into their videos first, and a video listed more than once is processed once.
+        Returns one {'url', 'success', 'file_path', 'error'} dict per item, in input order.
+        """
+        max_workers = max_workers if max_workers else self.max_workers
+        entries = self.expand_urls(youtube_urls)
+        # Two workers on the same video would share its journal row and staging file
+        unique_urls = {}
+        for entry in entries:
+            unique_urls.setdefault(self._dedupe_key(entry['url']), entry['url'])
+        duplicates = len(entries) - len(unique_urls)
+        print(f"Processing {len(unique_urls)} URLs with up to {max_workers} concurrent workers"
+              f"{f' ({duplicates} duplicates skipped)' if duplicates else ''}.")
+        prefetched_metadata = self.prefetch_metadata(entries)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            unique_results = dict(zip(unique_urls, executor.map(
+                lambda url: self.process_item(url, prefetched_metadata), unique_urls.values()
+            )))
+        results = [dict(unique_results[self._dedupe_key(entry['url'])], url=entry['url']) for entry in entries]
+
+        self.print_batch_summary(results)
+        return results
+
+    def _dedupe_key(self, youtube_url: str) -> str:
+        return self.downloader.extract_video_id(youtube_url) or youtube_url
+
+    def expand_urls(self, youtube_urls: list[str]) -> list[dict]:
+        """
+        Expands playlist URLs into {'url', 'title'} entries; plain URLs get a title of None.
+        """
+        entries = []
+        for url in youtube_urls:
+            if self.downloader.is_playlist_url(url):
+                try:
+                    entries.extend(self.downloader.enumerate_playlist(url))
+                except Exception as e:
+                    print(f"Error enumerating playlist {url}: {e}")
+            else:
+                entries.append({'url': url, 'title': None})
+        return entries
+
+    def prefetch_metadata(self, entries: list[dict], skip_existing: bool = None) -> dict:
+        """
+        Playlist enumeration already gives us titles, so resolve their metadata in a few batched LLM requests up front.
+        Entries already in the library are left out, since _process_url will skip them anyway.
+        skip_existing overrides the orchestrator's setting (a daemon job may pass --force).
+        Returns a map of YouTube title -> metadata for the titles that resolved.
+        """
+        if self.skip_existing if skip_existing is None else skip_existing:
+            entries = [entry for entry in entries if not self.library_index.lookup(entry['url'])]
+        known_titles = [entry['title'] for entry in entries if entry['title']]
+        if not known_titles:
+            return {}
+        print(f"Inferring metadata for {len(known_titles)} known titles in batches...")
+        batch_metadata = self.metadata_processor.infer_metadata_batch(known_titles)
+        return {t: m for t, m in zip(known_titles, batch_metadata) if m}
+
+    def process_item(self, youtube_url: str, prefetched_metadata: dict = None, skip_existing: bool = None) -> dict:
+        """
+        Runs the pipeline for one URL without raising. skip_existing overrides the orchestrator's setting.
+        Returns {'url', 'success', 'file_path', 'error'}.
+        """
+        print(f"Starting process for YouTube URL: {youtube_url}")
+        try:
+            file_path = self._process_url(youtube_url, prefetched_metadata, skip_existing)
+            return {'url': youtube_url, 'success': True, 'file_path': file_path, 'error': None}
+        except Exception as e:
+            print(f"Error processing {youtube_url}: {e}")
+            return {'url': youtube_url, 'success': False, 'file_path': None, 'error': str(e)}
+
+    def print_batch_summary(self, results: list[dict]):
+        succeeded = [r for r in results if r['success']]
+        failed = [r for r in results if not r['success']]
+        print("\nBatch summary:")
+        for r in results:
+            if r['success']:
+                print(f"  [OK]   {r['url']} -> {r['file_path']}")
+            else:
+                print(f"  [FAIL] {r['url']}: {r['error']}")
+        print(f"{len(succeeded)} succeeded, {len(failed)} failed, {len(results)} total.")
+        if self.metadata_cache:
+            stats = self.metadata_cache.stats()
+            print(f"Metadata cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries.")
+
+    def _process_url(self, youtube_url: str, prefetched_metadata: dict = None, skip_existing: bool = None) -> str:
+        """
+        Runs the pipeline for one URL inside a 'track' span, so every stage span it records carries the URL.
+        Jobs for the same video wait for each other; the later one then finds it in the library.
+        The Prometheus metrics file is refreshed after each track.
+        """
+        key = self._dedupe_key(youtube_url)
+        with self._video_locks_lock:
+            entry = self._video_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0], metrics.track(youtube_url), metrics.span('track'):
+                return self._run_pipeline(youtube_url, prefetched_metadata, skip_existing)
+        finally:
+            with self._video_locks_lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._video_locks[key] # Nobody holds or waits on it any more
+            metrics.write_prometheus()
+
+    def _run_pipeline(self, youtube_url: str, prefetched_metadata: dict = None, skip_existing: bool = None) -> str:
+        """
+        Extract -> (download | infer | album art) -> tag -> publish for one URL. Raises on failure.
+        Metadata inference and album art only need the extracted title and thumbnail URL, so in
+        concurrent mode they run while the audio downloads and tagging joins on all three.
+        The audio is downloaded and tagged in the staging directory and only renamed into the
+        output directory once finished.
+        Each finished stage is checkpointed in the job journal; a failed or interrupted job resumes
+        from its checkpoints, and transient network/LLM errors are retried with backoff.
+        prefetched_metadata optionally maps YouTube titles to already inferred metadata.
+        """
+        skip_existing = self.skip_existing if skip_existing is None else skip_existing
+        # 0. Skip videos that are already in the library, before any network work
+        if skip_existing:
+            existing = self.library_index.lookup(youtube_url)
+            if existing:
+                print(f"Already in library: {existing['output_path']}")
+                return existing['output_path']
+
+        job = self.journal.start(youtube_url)
+        if job['stage'] != 'pending':
+            print(f"Resuming job from stage '{job['stage']}' (attempt {job['attempts']}).")
+
+        pending_stages = []
+        try:
+            downloaded_file_path = job['file_path'] if job['file_path'] and os.path.exists(job['file_path']) else None
+            if downloaded_file_path and job['youtube_title']:
+                # The audio survived the previous attempt, so there is nothing left to extract
+                info_dict = None
+                video_id = job['video_id']
+                youtube_title = job['youtube_title']
+                thumbnail_url = job['thumbnail_url']
+                uploader = job['uploader']
+                source_url = youtube_url
+            else:
+                downloaded_file_path = None
+                # 1. Extract YouTube info (title and thumbnail for LLM and art)
+                info_dict = retry_call(self.downloader.extract_info, youtube_url, description="extraction", **self.retry_options)
+                video_id = info_dict.get('id')
+                if skip_existing and video_id:
+                    # URLs without a recognizable video ID can only be matched after extraction
+                    existing = self.library_index.lookup(video_id=video_id)
+                    if existing:
+                        print(f"Already in library: {existing['output_path']}")
+                        self.journal.checkpoint(youtube_url, 'tagged', file_path=existing['output_path'])
+                        return existing['output_path']
+                youtube_title = info_dict.get('title')
+                thumbnail_url = self.downloader.select_thumbnail_url(info_dict)
+                uploader = info_dict.get('channel') or info_dict.get('uploader')
+                source_url = info_dict.get('webpage_url') or youtube_url
+                if not youtube_title:
+                    raise ValueError("Could not extract YouTube title.")
+                self.journal.checkpoint(youtube_url, 'extracted', video_id=video_id, youtube_title=youtube_title,
+                                        thumbnail_url=thumbnail_url, uploader=uploader)
             print(f"Extracted YouTube Title: '{youtube_title}'")
             if thumbnail_url:
                 print(f"Extracted Thumbnail URL: {thumbnail_url}")
 
-            # 2. Download and convert audio
-            downloaded_file_path = self.downloader.download_audio(youtube_url)
-            print(f"Audio downloaded to: {downloaded_file_path}")
+            # 2. Start metadata inference and album art fetch
+            if job['title'] and job['artist']:
+                metadata_future = self._completed_future({'title': job['title'], 'artist': job['artist']})
+            else:
+                metadata_future = self._run_stage(
+                    self._infer_metadata, youtube_url, youtube_title, uploader, prefetched_metadata
+                )
+            album_art_future = self._run_stage(self.metadata_processor.fetch_album_art, thumbnail_url)
+            pending_stages = [metadata_future, album_art_future]
 
-            # 3. Infer metadata using LLM
-            print("Inferring metadata using LLM...")
-            inferred_metadata = self.metadata_processor.infer_metadata_with_llm(youtube_title)
+            # 3. Download and convert audio
+            if downloaded_file_path:
+                print(f"Reusing audio downloaded by a previous attempt: {downloaded_file_path}")
+            else:
+                track = retry_call(self.downloader.download_from_info, info_dict, description="download", **self.retry_options)
+                downloaded_file_path = track['filepath']
+                self.journal.checkpoint(youtube_url, 'downloaded', file_path=downloaded_file_path)
+                print(f"Audio downloaded to: {downloaded_file_path}")
+
+            # 4. Join on inference and album art
+            inferred_metadata = metadata_future.result()
+            album_art = album_art_future.result() if thumbnail_url else None
             title = inferred_metadata.get('title')
             artist = inferred_metadata.get('artist')
             print(f"Inferred Metadata: Title='{title}', Artist='{artist}'")
 
-            # 4. Set metadata on the downloaded file
-            print("Setting ID3 tags...")
-            self.metadata_processor.set_audio_metadata(downloaded_file_path, title, artist, thumbnail_url)
+            # 5. Set metadata on the staged file. A failed write fails the job here, before anything is published,
+            # and leaves the staged file for --resume
+            print("Setting metadata tags...")
+            source = {'video_id': video_id, 'url': source_url, 'title': youtube_title}
+            self.metadata_processor.set_audio_metadata(
+                downloaded_file_path, title, artist, album_art=album_art, source=source
+            )
             print("Metadata successfully set.")
 
-            # Note: Spotify needs time to pick up new files.
-            print("\nProcess complete!")
-            print(f"File saved to: {downloaded_file_path}")
-            print("Please open Spotify, navigate to 'Local Files', and the new track should appear shortly.")
-            print("You might need to restart Spotify or wait a few minutes for it to rescan.")
+            # 6. Move the finished track into the output directory and record it so repeat URLs are recognized.
+            # A crash before the checkpoint just redoes the job, and the rename replaces the same file.
+            output_path = self.downloader.publish(downloaded_file_path)
+            if video_id:
+                self.library_index.record(video_id, source_url, output_path, title, artist, youtube_title)
+            self.journal.checkpoint(youtube_url, 'tagged', file_path=output_path)
+            return output_path
 
         except Exception as e:
-            print(f"\nAn error occurred during the process: {e}")
-            print("Please ensure your API key is correct and the YouTube URL is valid.")
-            # Clean up partial downloads if any
-            if downloaded_file_path and os.path.exists(downloaded_file_path):
-                os.remove(downloaded_file_path)
-                print(f"Cleaned up partial file: {downloaded_file_path}")
\ No newline at end of file
+            for future in pending_stages:
+                future.cancel()
+            # Completed stages stay checkpointed (including the downloaded file) so a rerun can resume
+            self.journal.mark_failed(youtube_url, str(e))
+            raise
+
+    def retag_library(self, dry_run: bool = False) -> dict:
+        """
+        Re-infers title and artist for every track in the output directory from its stored YouTube title
+        and rewrites the tags that changed. Returns the counts from Retagger.retag.
+        """
+        retagger = Retagger(self.output_dir, self.metadata_processor, self.library_index,
+                            staging_dir=self.downloader.staging_dir, same_filesystem=self.downloader.same_filesystem,
+                            workers=self.config.retag_workers)
+        return retagger.retag(dry_run=dry_run)
+
+    def _infer_metadata(self, youtube_url: str, youtube_title: str, uploader: str = None,
+                        prefetched_metadata: dict = None) -> dict:
+        inferred_metadata = (prefetched_metadata or {}).get(youtube_title)
+        if not inferred_metadata:
+            print("Inferring metadata...")
+            inferred_metadata = self.metadata_processor.infer_metadata(youtube_title, uploader)
+        self.journal.checkpoint(youtube_url, 'inferred', title=inferred_metadata.get('title'),
+                                artist=inferred_metadata.get('artist'))
+        return inferred_metadata
+
+    @staticmethod
+    def _completed_future(value) -> Future:
+        future = Future()
+        future.set_result(value)
+        return future
+
+    def _run_stage(self, fn, *args) -> Future:
+        """
+        Runs a pipeline stage on the stage pool in concurrent mode, or inline otherwise.
+        Either way the caller gets a Future to join on.
+        """
+        if self.concurrent_stages:
+            # Carry the current track over to the pool thread so its metrics spans are attributed to it
+            return self._stage_executor.submit(contextvars.copy_context().run, fn, *args)
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def close(self):
+        """
+        Shuts down the stage worker pool, flushes metrics and closes the library index, job journal and metadata cache.
+        """
+        self._stage_executor.shutdown(wait=True)
+        self.metadata_processor.close()
+        metrics.close()
+        self.library_index.close()
+        self.journal.close()
+        if self.metadata_cache:
+            self.metadata_cache.close()
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import re
+import shutil
+from functools import partial
+from multiprocessing import Pool
+
+from library_index import LibraryIndex
+from metadata_processor import MetadataProcessor
+from youtube_downloader import move_into_place
+
+# The ' [<video id>]' suffix this tool's file names end with; older files are named after the YouTube title alone
+_VIDEO_ID_SUFFIX = re.compile(r' \[([0-9A-Za-z_-]{11})\]$')
+
+
+def _read_track(path: str) -> tuple[str, dict | None]:
+    import audio_tags # Imported in the worker process; mutagen is only needed here
+    return path, audio_tags.read_tags(path)
+
+
+def _write_track(staging_dir: str, same_filesystem: bool, change: dict) -> dict:
+    """
+    Rewrites the changed tags of one file on a copy in the staging directory, then moves the copy over
+    the original, so Spotify never sees a half-written file. Returns the change with 'error', or with
+    'content_hash' for the library index on success.
+    """
+    import audio_tags
+    path = change['path']
+    digest = hashlib.sha256(path.encode('utf-8')).hexdigest()[:12]
+    staged_path = os.path.join(staging_dir, f"retag-{digest}{os.path.splitext(path)[1]}")
+    try:
+        shutil.copy2(path, staged_path)
+        audio_tags.update_tags(staged_path, **change['updates'])
+        content_hash = LibraryIndex.hash_file(staged_path)
+        move_into_place(staged_path, path, same_filesystem)
+        return dict(change, error=None, content_hash=content_hash)
+    except Exception as e:
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
+        return dict(change, error=f"{type(e).__name__}: {e}")
+
+
+def source_from_filename(path: str) -> dict:
+    """
+    Recovers the YouTube title (and video ID, when the name carries one) from a file name, for files
+    saved without source tags: those were named after the YouTube title.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    match = _VIDEO_ID_SUFFIX.search(stem)
+    if not match:
+        return {'title': stem}
+    return {'title': stem[:match.start()], 'video_id': match.group(1)}
+
+
+class Retagger:
+    """
+    Re-runs metadata inference for tracks already in the output directory and fixes their tags.
+    Each file's stored YouTube title (or, for files saved before source tags existed, its file name) goes
+    through the batched, cached inference path, so no audio is downloaded again. Changed files are
+    rewritten in staging_dir and moved over the originals. Reading and writing tags runs in a process
+    pool, since mutagen's parsing is CPU-bound Python.
+    """
+
+    def __init__(self, output_dir: str, metadata_processor: MetadataProcessor, library_index: LibraryIndex,
+                 staging_dir: str, same_filesystem: bool = True, workers: int = None):
+        self.output_dir = output_dir
+        self.metadata_processor = metadata_processor
+        self.library_index = library_index
+        self.staging_dir = staging_dir
+        self.same_filesystem = same_filesystem
+        self.workers = workers if workers else os.cpu_count()
+
+    def retag(self, dry_run: bool = False) -> dict:
+        """
+        Prints a diff of every title/artist change and, unless dry_run, writes only the changed tags
+        and refreshes the library index entries of the rewritten files.
+        Returns counts of {'scanned', 'unreadable', 'unchanged', 'changed', 'failed'}.
+        """
+        import audio_tags
+        paths = []
+        for root, dirs, files in os.walk(self.output_dir):
+            dirs[:] = [d for d in dirs if not d.startswith('.')] # Skips staging and other hidden directories
+            paths.extend(os.path.join(root, name) for name in files if audio_tags.is_supported(name))
+        paths.sort()
+        counts = {'scanned': len(paths), 'unreadable': 0, 'unchanged': 0, 'changed': 0, 'failed': 0}
+        if not paths:
+            return counts
+
+        with Pool(processes=min(self.workers, len(paths))) as pool:
+            print(f"Reading tags from {len(paths)} files with {min(self.workers, len(paths))} processes...")
+            tracks = []
+            for path, tags in pool.imap(_read_track, paths, chunksize=64):
+                if not tags:
+                    counts['unreadable'] += 1
+                    continue
+                source = tags['source'] if tags['source'].get('title') else dict(source_from_filename(path), **tags['source'])
+                tracks.append({'path': path, 'tags': tags, 'source': source})
+
+            inferred = self.metadata_processor.infer_metadata_batch([track['source']['title'] for track in tracks])
+            changes = []
+            for track, metadata in zip(tracks, inferred):
+                if not metadata:
+                    counts['failed'] += 1
+                    continue
+                updates = {field: metadata[field] for field in ('title', 'artist')
+                           if metadata.get(field) and metadata[field] != track['tags'][field]}
+                if not updates:
+                    counts['unchanged'] += 1
+                    continue
+                self._print_diff(track, updates)
+                changes.append(dict(track, updates=updates))
+
+            if dry_run or not changes:
+                counts['changed'] = len(changes)
+                return counts
+
+            write_track = partial(_write_track, self.staging_dir, self.same_filesystem)
+            for change in pool.imap_unordered(write_track, changes, chunksize=16):
+                if change['error']:
+                    print(f"Error updating tags of '{change['path']}': {change['error']}")
+                    counts['failed'] += 1
+                    continue
+                counts['changed'] += 1
+                self._update_index(change)
+        return counts
+
+    def _print_diff(self, track: dict, updates: dict):
+        print(os.path.relpath(track['path'], self.output_dir))
+        for field, value in updates.items():
+            print(f"-  {field}: {track['tags'][field]}")
+            print(f"+  {field}: {value}")
+
+    def _update_index(self, change: dict):
+        source = change['source']
+        if not source.get('video_id'):
+            return
+        url = source.get('url') or f"https://www.youtube.com/watch?v={source['video_id']}"
+        tags = dict(change['tags'], **change['updates'])
+        self.library_index.record(source['video_id'], url, change['path'], tags['title'], tags['artist'],
+                                  source.get('title'), content_hash=change['content_hash'])
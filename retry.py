@@ -0,0 +1,103 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+# Exception class names (from requests/urllib3, yt-dlp and the LLM SDKs) that indicate a blip worth retrying.
+# Matched by name so this module doesn't have to import every SDK.
+_TRANSIENT_ERROR_NAMES = {
+    'ConnectionError', 'ConnectTimeout', 'ReadTimeout', 'Timeout', 'TimeoutError', 'ChunkedEncodingError',
+    'ProtocolError', 'IncompleteRead', 'RemoteDisconnected', 'ConnectionResetError', 'ConnectionAbortedError',
+    'BrokenPipeError', 'TransportError', 'APIConnectionError', 'APITimeoutError', 'RateLimitError',
+    'InternalServerError', 'OverloadedError', 'ServiceUnavailableError', 'ServiceUnavailable',
+    'ResourceExhausted', 'DeadlineExceeded', 'TooManyRequests',
+}
+_TRANSIENT_MESSAGES = (
+    'timed out', 'timeout', 'temporarily unavailable', 'temporary failure', 'connection reset',
+    'connection aborted', 'connection refused', 'remote end closed', 'incompleteread', 'http error 429',
+    'http error 500', 'http error 502', 'http error 503', 'http error 504', 'too many requests',
+    'unable to download webpage', 'unable to download api page', 'name resolution',
+)
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """
+    Returns True for network, rate-limit and server-side errors that may succeed on retry.
+    Follows __cause__/__context__ and yt-dlp's wrapped exc_info.
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if type(exc).__name__ in _TRANSIENT_ERROR_NAMES:
+            return True
+        status = getattr(exc, 'status_code', None) or getattr(getattr(exc, 'response', None), 'status_code', None)
+        if isinstance(status, int) and (status == 429 or status >= 500):
+            return True
+        message = str(exc).lower()
+        if any(fragment in message for fragment in _TRANSIENT_MESSAGES):
+            return True
+        wrapped = getattr(exc, 'exc_info', None) # yt_dlp.DownloadError keeps the original exception here
+        if isinstance(wrapped, tuple) and len(wrapped) > 1 and isinstance(wrapped[1], BaseException):
+            exc = wrapped[1]
+        else:
+            exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """
+    Exponential backoff with full jitter: uniform in [0, min(max_delay, base_delay * 2**attempt)].
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def retry_call(fn, *args, attempts: int = 4, base_delay: float = 1.0, max_delay: float = 30.0,
+               description: str = None, should_retry=is_transient_error, **kwargs):
+    """
+    Calls fn(*args, **kwargs), retrying transient failures up to attempts times in total.
+    should_retry decides which errors are transient. Non-transient errors, and the last transient one, are re-raised.
+    """
+    description = description or getattr(fn, '__name__', 'call')
+    for attempt in range(attempts):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == attempts - 1 or not should_retry(e):
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            print(f"Transient error in {description} (attempt {attempt + 1}/{attempts}): {e}. Retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+
+_RATE_LIMIT_ERROR_NAMES = {'RateLimitError', 'ResourceExhausted', 'TooManyRequests'}
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """
+    Returns True for HTTP 429 / quota errors from the LLM SDKs and HTTP clients.
+    """
+    if type(exc).__name__ in _RATE_LIMIT_ERROR_NAMES:
+        return True
+    status = getattr(exc, 'status_code', None) or getattr(getattr(exc, 'response', None), 'status_code', None)
+    return status == 429
+
+
+def retry_after_seconds(exc: BaseException) -> float | None:
+    """
+    Reads the server's requested wait from the error's HTTP response: 'retry-after-ms', or
+    'Retry-After' as seconds or an HTTP date. Returns None if the error carries no such header.
+    """
+    headers = getattr(getattr(exc, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    try:
+        if headers.get('retry-after-ms'):
+            return max(0.0, float(headers['retry-after-ms']) / 1000)
+        value = headers.get('retry-after')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,196 @@
+import threading
+import time
+
+import pytest
+
+from llm_providers import LLMProvider
+from llm_router import LLMRouter, LLMUnavailableError, ProviderLimiter
+
+NO_RETRY_DELAY = {'attempts': 3, 'base_delay': 0, 'max_delay': 0}
+
+
+class RateLimitError(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__('rate limited')
+        self.status_code = 429
+        self.response = type('Response', (), {'status_code': 429,
+                                              'headers': {'retry-after': retry_after} if retry_after else {}})()
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+class FakeProvider(LLMProvider):
+    """
+    Answers with a fixed text after an optional delay, or raises the next queued error.
+    """
+    model = 'fake'
+
+    def __init__(self, name, answer='{"ok": true}', delay=0.0, errors=None):
+        self.name = name
+        self.answer = answer
+        self.delay = delay
+        self.errors = list(errors or [])
+        self.calls = 0
+
+    def complete(self, prompt, max_tokens=500):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        time.sleep(self.delay)
+        return self.answer, 1, 1
+
+
+def _router(providers, **kwargs):
+    limiters = {provider.name: ProviderLimiter(1000, 8) for provider in providers}
+    return LLMRouter(providers, limiters, retry_options=NO_RETRY_DELAY, **kwargs)
+
+
+def _parse(content):
+    if content == 'garbage':
+        raise ValueError('unusable answer')
+    return content
+
+
+def test_rate_limit_halves_rate_and_concurrency_and_honors_retry_after():
+    limiter = ProviderLimiter(8.0, 4)
+    before = time.monotonic()
+    limiter.on_rate_limited(retry_after=0.3)
+    assert limiter.rate == 4.0
+    assert limiter.concurrency == 2.0
+
+    with limiter.acquire():
+        assert time.monotonic() - before >= 0.25
+
+    limiter.on_rate_limited()
+    assert limiter.rate == 2.0
+    assert limiter.concurrency == 1.0
+
+
+def test_rate_limit_floors_and_success_recovers():
+    limiter = ProviderLimiter(1.0, 2, min_rate=0.5)
+    for _ in range(5):
+        limiter.on_rate_limited(retry_after=0)
+    assert limiter.rate == 0.5
+    assert limiter.concurrency == 1.0
+    for _ in range(100):
+        limiter.on_success(0.01)
+    assert limiter.rate == 1.0
+    assert limiter.concurrency == 2.0
+
+
+def test_router_feeds_429_into_limiter():
+    primary = FakeProvider('primary', errors=[RateLimitError(retry_after='0')])
+    router = _router([primary])
+    assert router.query('prompt', _parse) == ('{"ok": true}', primary)
+    assert primary.calls == 2
+    assert router.limiters['primary'].rate < 1000 # Halved, then partly regrown by the success
+
+
+def test_fallback_order():
+    first = FakeProvider('first', answer='garbage')
+    second = FakeProvider('second', errors=[ValueError('boom')])
+    third = FakeProvider('third', answer='third answer')
+    result, provider = _router([first, second, third]).query('prompt', _parse)
+    assert (result, provider) == ('third answer', third)
+    assert (first.calls, second.calls, third.calls) == (1, 1, 1)
+
+
+def test_all_providers_failing_raises():
+    router = _router([FakeProvider('a', answer='garbage'), FakeProvider('b', answer='garbage')])
+    with pytest.raises(LLMUnavailableError, match='a: .*b: '):
+        router.query('prompt', _parse)
+
+
+def test_timeout_moves_to_fallback_without_retrying():
+    slow = FakeProvider('slow', errors=[APITimeoutError('Request timed out.')] * 10)
+    fast = FakeProvider('fast')
+    router = _router([slow, fast])
+    assert router.query('prompt', _parse)[1] is fast
+    assert slow.calls == 1
+
+
+def test_timeout_is_retried_by_the_last_provider():
+    only = FakeProvider('only', errors=[APITimeoutError('Request timed out.')])
+    assert _router([only]).query('prompt', _parse)[1] is only
+    assert only.calls == 2
+
+
+def test_repeated_timeouts_trip_the_provider():
+    slow = FakeProvider('slow', errors=[APITimeoutError('Request timed out.')] * 10)
+    fast = FakeProvider('fast')
+    router = _router([slow, fast])
+    for _ in range(5):
+        assert router.query('prompt', _parse)[1] is fast
+    assert slow.calls == router.limiters['slow'].trip_after_timeouts
+    assert router.limiters['slow'].is_tripped()
+
+
+def _warm(router, name, latency, samples=5):
+    for _ in range(samples):
+        router.limiters[name].on_success(latency)
+
+
+def test_hedge_fires_and_first_good_answer_wins():
+    slow = FakeProvider('slow', answer='slow answer', delay=1.0)
+    fast = FakeProvider('fast', answer='fast answer')
+    router = _router([slow, fast], hedge_percentile=90, hedge_min_samples=5)
+    _warm(router, 'slow', 0.01)
+    try:
+        started = time.perf_counter()
+        result, provider = router.query('prompt', _parse)
+        assert (result, provider) == ('fast answer', fast)
+        assert time.perf_counter() - started < 0.5
+    finally:
+        router.close()
+
+
+def test_hedge_waits_for_latency_samples():
+    slow = FakeProvider('slow', answer='slow answer', delay=0.2)
+    fast = FakeProvider('fast', answer='fast answer')
+    router = _router([slow, fast], hedge_percentile=90, hedge_min_samples=5)
+    try:
+        assert router.query('prompt', _parse) == ('slow answer', slow)
+        assert fast.calls == 0
+    finally:
+        router.close()
+
+
+def test_hedge_clock_excludes_time_queued_for_the_limiter():
+    primary = FakeProvider('primary', delay=0.05)
+    backup = FakeProvider('backup')
+    router = _router([primary, backup], hedge_percentile=90, hedge_min_samples=5)
+    _warm(router, 'primary', 0.3)
+    limiter = router.limiters['primary']
+    try:
+        with limiter.acquire():
+            limiter.on_rate_limited(retry_after=0.5) # The next request queues locally for half a second
+        result, provider = router.query('prompt', _parse)
+        assert provider is primary
+        assert backup.calls == 0
+    finally:
+        router.close()
+
+
+def test_limiter_caps_in_flight_requests():
+    limiter = ProviderLimiter(1000, 2)
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def request():
+        with limiter.acquire():
+            with lock:
+                in_flight.append(1)
+                peak.append(len(in_flight))
+            time.sleep(0.05)
+            with lock:
+                in_flight.pop()
+
+    threads = [threading.Thread(target=request) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) == 2
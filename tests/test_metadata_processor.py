@@ -0,0 +1,59 @@
+import json
+import re
+
+from llm_providers import LLMProvider
+from llm_router import LLMRouter, ProviderLimiter
+from metadata_processor import MetadataProcessor
+
+NO_RETRY_DELAY = {'attempts': 1, 'base_delay': 0, 'max_delay': 0}
+
+
+class BatchProvider(LLMProvider):
+    """
+    Answers batched prompts with 'Artist - Title' split into fields, leaving out the titles in skip_once
+    the first time each is asked for. Records the titles of every request.
+    """
+    name = 'fake'
+    model = 'fake'
+
+    def __init__(self, skip_once=()):
+        self.skip_once = set(skip_once)
+        self.requests = []
+
+    def complete(self, prompt, max_tokens=500):
+        titles = [json.loads(title) for title in re.findall(r'^\d+: (".*")$', prompt.split('Input:\n')[-1], re.M)]
+        self.requests.append(titles)
+        results = []
+        for index, youtube_title in enumerate(titles):
+            if youtube_title in self.skip_once:
+                self.skip_once.discard(youtube_title)
+                continue
+            artist, _, title = youtube_title.partition(' - ')
+            results.append({'index': index, 'title': title, 'artist': artist})
+        return json.dumps({'results': results}), 1, 1
+
+
+def _processor(provider, batch_size=20):
+    processor = MetadataProcessor('openai', 'test-key', batch_size=batch_size, title_parser_threshold=2.0,
+                                  retry_options=NO_RETRY_DELAY)
+    processor.router = LLMRouter([provider], {provider.name: ProviderLimiter(1000, 8)}, retry_options=NO_RETRY_DELAY)
+    return processor
+
+
+def test_batch_retries_only_the_entries_that_failed():
+    provider = BatchProvider(skip_once={'B - Two'})
+    results = _processor(provider).infer_metadata_batch(['A - One', 'B - Two', 'C - Three'])
+    assert results == [{'title': 'One', 'artist': 'A'}, {'title': 'Two', 'artist': 'B'},
+                       {'title': 'Three', 'artist': 'C'}]
+    assert provider.requests == [['A - One', 'B - Two', 'C - Three'], ['B - Two']]
+
+
+def test_batch_gives_up_after_max_retries_and_keeps_input_order_and_duplicates():
+    provider = BatchProvider(skip_once={'B - Two'})
+    results = _processor(provider, batch_size=1).infer_metadata_batch(['B - Two', 'A - One', 'B - Two'], max_retries=0)
+    assert results == [None, {'title': 'One', 'artist': 'A'}, None]
+    assert sorted(provider.requests) == [['A - One'], ['B - Two']]
+
+    fallback = _processor(BatchProvider(skip_once={'B - Two'})).infer_metadata_batch(['B - Two'], max_retries=0,
+                                                                                    fallback=True)
+    assert fallback == [{'title': 'B - Two', 'artist': 'Unknown'}]
@@ -0,0 +1,154 @@
+import os
+import threading
+
+import pytest
+
+from job_journal import JobJournal
+from orchestrator import Orchestrator
+
+URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+VIDEO_ID = 'dQw4w9WgXcQ'
+
+
+class FakeYouTube:
+    """
+    Stands in for yt-dlp: extraction returns a fixed info dict and a download writes a small file into staging.
+    """
+
+    def __init__(self, staging_dir):
+        self.staging_dir = staging_dir
+        self.extractions = 0
+        self.downloads = 0
+
+    def extract_info(self, youtube_url):
+        self.extractions += 1
+        return {'id': VIDEO_ID, 'title': 'Rick Astley - Never Gonna Give You Up (Official Video)',
+                'webpage_url': youtube_url, 'channel': 'Rick Astley'}
+
+    def download_from_info(self, info_dict):
+        self.downloads += 1
+        path = os.path.join(self.staging_dir, f"{info_dict['title']} [{info_dict['id']}].mp3")
+        with open(path, 'wb') as f:
+            f.write(b'audio')
+        return {'filepath': path}
+
+
+class FakeMetadataProcessor:
+    """
+    Counts inferences and tag writes; tag_errors are raised by the next writes, in order.
+    """
+
+    def __init__(self, tag_errors=None):
+        self.tag_errors = list(tag_errors or [])
+        self.inferences = 0
+        self.tagged = []
+
+    def infer_metadata(self, youtube_title, uploader=None):
+        self.inferences += 1
+        return {'title': 'Never Gonna Give You Up', 'artist': 'Rick Astley'}
+
+    def fetch_album_art(self, thumbnail_url):
+        return None
+
+    def set_audio_metadata(self, file_path, title, artist, album_art=None, source=None):
+        if self.tag_errors:
+            raise self.tag_errors.pop(0)
+        self.tagged.append((file_path, title, artist))
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def orchestrator(tmp_path, monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-key')
+    monkeypatch.setenv('YT_SPOTIFY_CACHE_DIR', str(tmp_path / 'cache'))
+    orchestrator = Orchestrator('openai', output_dir=str(tmp_path / 'out'), use_cache=False)
+    orchestrator.retry_options = {'attempts': 1, 'base_delay': 0, 'max_delay': 0}
+    youtube = FakeYouTube(orchestrator.downloader.staging_dir)
+    monkeypatch.setattr(orchestrator.downloader, 'extract_info', youtube.extract_info)
+    monkeypatch.setattr(orchestrator.downloader, 'download_from_info', youtube.download_from_info)
+    orchestrator.youtube = youtube
+    orchestrator.metadata_processor = FakeMetadataProcessor()
+    yield orchestrator
+    orchestrator.close()
+
+
+def test_failed_tag_write_publishes_nothing_and_resume_reuses_staged_file_and_metadata(orchestrator):
+    orchestrator.metadata_processor.tag_errors = [OSError('disk full')]
+    result = orchestrator.process_item(URL)
+    assert not result['success']
+    assert not [name for name in os.listdir(orchestrator.output_dir) if name.endswith('.mp3')]
+    assert orchestrator.library_index.lookup(URL) is None
+    job = orchestrator.journal.get(URL)
+    assert job['stage'] != 'tagged' and job['last_error'] == 'disk full'
+    assert job['title'] == 'Never Gonna Give You Up' and os.path.exists(job['file_path'])
+
+    result = orchestrator.process_item(URL)
+    assert result['success']
+    assert os.path.dirname(result['file_path']) == orchestrator.output_dir
+    assert not os.path.exists(job['file_path'])
+    assert orchestrator.youtube.extractions == 1
+    assert orchestrator.youtube.downloads == 1
+    assert orchestrator.metadata_processor.inferences == 1
+    assert orchestrator.journal.get(URL)['stage'] == 'tagged'
+    assert orchestrator.library_index.lookup(URL)['output_path'] == result['file_path']
+
+
+def test_resume_downloads_again_when_staged_file_is_gone_but_keeps_inferred_metadata(orchestrator):
+    orchestrator.metadata_processor.tag_errors = [OSError('disk full')]
+    orchestrator.process_item(URL)
+    os.remove(orchestrator.journal.get(URL)['file_path'])
+
+    result = orchestrator.process_item(URL)
+    assert result['success']
+    assert orchestrator.youtube.extractions == 2
+    assert orchestrator.youtube.downloads == 2
+    assert orchestrator.metadata_processor.inferences == 1
+
+
+def test_tagged_job_is_skipped_via_library_and_restarted_from_scratch_with_force(orchestrator):
+    first = orchestrator.process_item(URL)
+    assert orchestrator.process_item(URL)['file_path'] == first['file_path']
+    assert orchestrator.youtube.extractions == 1
+
+    again = orchestrator.process_item(URL, skip_existing=False)
+    assert again['success'] and again['file_path'] == first['file_path']
+    assert orchestrator.youtube.extractions == 2
+    assert orchestrator.youtube.downloads == 2
+    assert orchestrator.metadata_processor.inferences == 2
+    job = orchestrator.journal.get(URL)
+    assert job['stage'] == 'tagged' and job['attempts'] == 1
+
+
+def test_journal_restarts_tagged_jobs_and_counts_attempts_of_unfinished_ones(tmp_path):
+    journal = JobJournal(str(tmp_path))
+    journal.start(URL)
+    journal.checkpoint(URL, 'extracted', video_id=VIDEO_ID, youtube_title='Title')
+    job = journal.start(URL)
+    assert job['stage'] == 'extracted' and job['youtube_title'] == 'Title' and job['attempts'] == 2
+    assert [job['url'] for job in journal.unfinished()] == [URL]
+
+    journal.checkpoint(URL, 'tagged', file_path='/music/Title.mp3')
+    assert journal.unfinished() == []
+    job = journal.start(URL)
+    assert job['stage'] == 'pending' and job['youtube_title'] is None and job['attempts'] == 1
+    with pytest.raises(ValueError):
+        journal.checkpoint(URL, 'uploaded')
+    journal.close()
+
+
+def test_same_video_jobs_run_one_at_a_time_and_release_their_lock(orchestrator):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(orchestrator.process_item(URL))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(result['success'] for result in results)
+    assert orchestrator.youtube.downloads == 1
+    assert orchestrator._video_locks == {}
+
+    orchestrator.metadata_processor.tag_errors = [OSError('disk full')]
+    orchestrator.process_item(URL, skip_existing=False)
+    assert orchestrator._video_locks == {}
@@ -0,0 +1,122 @@
+import time
+from email.utils import formatdate
+
+import pytest
+
+from retry import is_rate_limit_error, is_transient_error, retry_after_seconds, retry_call
+
+
+class _Response:
+    def __init__(self, status_code=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class _HTTPError(Exception):
+    def __init__(self, message='error', status_code=None, headers=None):
+        super().__init__(message)
+        self.response = _Response(status_code, headers)
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+class DownloadError(Exception):
+    def __init__(self, message, exc_info=None):
+        super().__init__(message)
+        self.exc_info = exc_info
+
+
+@pytest.mark.parametrize('exc', [
+    APITimeoutError('Request timed out.'),
+    RateLimitError('slow down'),
+    _HTTPError(status_code=429),
+    _HTTPError(status_code=503),
+    ConnectionResetError('connection reset by peer'),
+    DownloadError('wrapped', exc_info=(None, ConnectionResetError('reset'), None)),
+])
+def test_transient_errors(exc):
+    assert is_transient_error(exc)
+
+
+@pytest.mark.parametrize('exc', [
+    ValueError('Error parsing LLM JSON response'),
+    _HTTPError('unauthorized', status_code=401),
+    _HTTPError('not found', status_code=404),
+    DownloadError('Video unavailable'),
+])
+def test_non_transient_errors(exc):
+    assert not is_transient_error(exc)
+
+
+def test_transient_error_found_through_cause():
+    try:
+        try:
+            raise ConnectionResetError('reset')
+        except ConnectionResetError as inner:
+            raise RuntimeError('request failed') from inner
+    except RuntimeError as outer:
+        assert is_transient_error(outer)
+
+
+def test_rate_limit_detection():
+    assert is_rate_limit_error(RateLimitError())
+    assert is_rate_limit_error(_HTTPError(status_code=429))
+    assert not is_rate_limit_error(_HTTPError(status_code=503))
+
+
+def test_retry_after_seconds_and_milliseconds():
+    assert retry_after_seconds(_HTTPError(status_code=429, headers={'retry-after': '2'})) == 2.0
+    assert retry_after_seconds(_HTTPError(status_code=429, headers={'retry-after-ms': '1500'})) == 1.5
+    assert retry_after_seconds(_HTTPError(status_code=429, headers={'retry-after': '-3'})) == 0.0
+
+
+def test_retry_after_http_date():
+    value = retry_after_seconds(_HTTPError(status_code=429, headers={'retry-after': formatdate(time.time() + 30, usegmt=True)}))
+    assert 25 <= value <= 30
+
+
+def test_retry_after_missing_or_garbage():
+    assert retry_after_seconds(_HTTPError(status_code=429)) is None
+    assert retry_after_seconds(ValueError('no response')) is None
+    assert retry_after_seconds(_HTTPError(status_code=429, headers={'retry-after': 'soon'})) is None
+
+
+def test_retry_call_retries_transient_errors_only():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionResetError('reset')
+        return 'ok'
+
+    assert retry_call(flaky, attempts=4, base_delay=0, max_delay=0) == 'ok'
+    assert len(calls) == 3
+
+    calls.clear()
+
+    def broken():
+        calls.append(1)
+        raise ValueError('bad input')
+
+    with pytest.raises(ValueError):
+        retry_call(broken, attempts=4, base_delay=0, max_delay=0)
+    assert len(calls) == 1
+
+
+def test_retry_call_honors_should_retry():
+    calls = []
+
+    def timing_out():
+        calls.append(1)
+        raise APITimeoutError('Request timed out.')
+
+    with pytest.raises(APITimeoutError):
+        retry_call(timing_out, attempts=4, base_delay=0, max_delay=0, should_retry=lambda e: False)
+    assert len(calls) == 1
@@ -0,0 +1,61 @@
+import os
+import time
+
+import pytest
+
+from youtube_downloader import PARTIAL_SUFFIX, YouTubeDownloader
+
+WEEK = 7 * 86400
+
+
+def _write(path, data=b'audio', age=0):
+    with open(path, 'wb') as f:
+        f.write(data)
+    if age:
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+@pytest.fixture
+def downloader(tmp_path):
+    return YouTubeDownloader(str(tmp_path / 'out'), staging_dir=str(tmp_path / 'staging'))
+
+
+@pytest.mark.parametrize('same_filesystem', [True, False])
+def test_publish_moves_staged_file_into_output_dir(downloader, same_filesystem):
+    downloader.same_filesystem = same_filesystem
+    _write(os.path.join(downloader.output_dir, 'Song [dQw4w9WgXcQ].mp3'), b'old')
+    staged_path = _write(os.path.join(downloader.staging_dir, 'Song [dQw4w9WgXcQ].mp3'), b'new')
+
+    final_path = downloader.publish(staged_path)
+    assert final_path == os.path.join(downloader.output_dir, 'Song [dQw4w9WgXcQ].mp3')
+    with open(final_path, 'rb') as f:
+        assert f.read() == b'new'
+    assert os.listdir(downloader.staging_dir) == []
+    assert os.listdir(downloader.output_dir) == ['Song [dQw4w9WgXcQ].mp3']
+
+
+def test_publish_leaves_files_already_in_output_dir_alone(tmp_path):
+    downloader = YouTubeDownloader(str(tmp_path))
+    path = _write(tmp_path / 'Song.mp3')
+    assert downloader.publish(path) == path
+    assert os.path.exists(path)
+
+
+def test_prune_staging_removes_only_stale_leftovers(downloader):
+    stale = _write(os.path.join(downloader.staging_dir, 'Old [aaaaaaaaaaa].webm.part'), age=WEEK + 60)
+    fresh = _write(os.path.join(downloader.staging_dir, 'New [bbbbbbbbbbb].mp3'))
+    stale_partial = _write(os.path.join(downloader.output_dir, f'.Old.mp3{PARTIAL_SUFFIX}'), age=WEEK + 60)
+    old_track = _write(os.path.join(downloader.output_dir, 'Old.mp3'), age=WEEK + 60)
+
+    assert downloader.prune_staging(WEEK) == 2
+    assert not os.path.exists(stale) and not os.path.exists(stale_partial)
+    assert os.path.exists(fresh) and os.path.exists(old_track)
+
+
+def test_prune_staging_keeps_audio_when_staging_in_output_dir(tmp_path):
+    downloader = YouTubeDownloader(str(tmp_path))
+    track = _write(tmp_path / 'Song.mp3', age=WEEK + 60)
+    assert downloader.prune_staging(WEEK) == 0
+    assert os.path.exists(track)
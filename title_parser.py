@@ -0,0 +1,119 @@
+import re
+
+# Words that mark a bracketed group or a trailing " - ..." suffix as video/upload noise rather than part of the song name.
+_NOISE_WORDS = (
+    r'official|oficial|music\s*video|video|audio|lyrics?|visuali[sz]er|stream|movie|hd|hq|4k|8k|1080p|720p|'
+    r'explicit|clean|dirty|uncensored|remix|live|full\s*album|mixtape|version|mv|m/v|color\s*coded|'
+    r'with\s*lyrics|remaster(?:ed)?|\d{4}'
+)
+
+# A bracketed group such as "(Official Music Video)", "[4K]" or "【MV】"
+_BRACKET_GROUP = re.compile(r'\s*[\(\[\{【]([^\(\)\[\]\{\}【】]*)[\)\]\}】]')
+_NOISE_GROUP_CONTENT = re.compile(
+    rf'^\s*(?:(?:{_NOISE_WORDS})[\s/&,.\-]*)+$|\b(?:version|video|visuali[sz]er|remaster(?:ed)?|mv)\s*$',
+    re.IGNORECASE
+)
+_NOISE_SUFFIX = re.compile(
+    r'\s*[-–—|/]\s*(?:official\s*(?:music\s*|lyric\s*|visual\s*)?(?:video|audio|visuali[sz]er|stream)|'
+    r'lyrics?(?:\s*video)?|audio(?:\s*only)?|visuali[sz]er|full\s*album)\s*$',
+    re.IGNORECASE
+)
+_FEAT_INLINE = re.compile(r'\s+((?:ft\.?|feat\.?|featuring)\s+.+)$', re.IGNORECASE)
+# Spaced separators only, so hyphenated names like "Jay-Z" or "Blink-182" are left alone
+_SEPARATOR = re.compile(r'\s+[-–—~|]\s+|\s*[–—]\s*')
+_BY_SEPARATOR = re.compile(r'^(?P<title>.+?)\s+by\s+(?P<artist>[^,]+)$', re.IGNORECASE)
+_BY_WORD = re.compile(r'\bby\b', re.IGNORECASE)
+_QUOTED_TITLE = re.compile(r'^(?P<artist>[^"“”]+?)\s*["“](?P<title>[^"“”]+)["”]\s*$')
+_TOPIC_CHANNEL = re.compile(r'^(?P<artist>.+?)\s+-\s+Topic$', re.IGNORECASE)
+_EDGE_JUNK = re.compile(r'^[\s\-–—|:~/,]+|[\s\-–—|:~/,]+$')
+_WHITESPACE = re.compile(r'\s+')
+# Things that look like "A - B" but are not "Artist - Song"
+_NON_MUSIC = re.compile(
+    r'\b(?:podcast|episode|ep\.?\s*\d+|interview|reaction|reacts?|trailer|teaser|review|tutorial|'
+    r'compilation|highlights|full\s*movie|documentary|news|vlog|gameplay|walkthrough|'
+    r'\d+\s*(?:hour|hr)s?|mix\b|playlist|lofi|beats to)\b|#\d+',
+    re.IGNORECASE
+)
+
+
+class TitleParser:
+    """
+    Deterministic parser for the common "Artist - Song (Official Video)" style of YouTube titles.
+    parse() returns a confidence score so callers can fall back to the LLM for anything ambiguous.
+    """
+
+    @staticmethod
+    def clean_title(title: str) -> str:
+        """
+        Removes video/upload noise such as "(Official Video)", "[4K]" or "- Lyrics" from a song title.
+        Featured-artist credits are kept, matching what the LLM prompt asks for.
+        """
+        def strip_noise_group(match):
+            content = match.group(1)
+            if _NOISE_GROUP_CONTENT.search(content):
+                return ''
+            return match.group(0)
+
+        cleaned = _BRACKET_GROUP.sub(strip_noise_group, title)
+        previous = None
+        while previous != cleaned: # Suffixes can stack, e.g. "Song - Lyrics - Official Audio"
+            previous = cleaned
+            cleaned = _NOISE_SUFFIX.sub('', cleaned)
+        cleaned = _WHITESPACE.sub(' ', cleaned)
+        return _EDGE_JUNK.sub('', cleaned).strip()
+
+    def parse(self, youtube_title: str, uploader: str = None) -> dict:
+        """
+        Splits a YouTube title into song title and artist.
+        Returns {'title', 'artist', 'confidence'}, where confidence is in [0, 1].
+        """
+        title = _WHITESPACE.sub(' ', youtube_title).strip()
+
+        # Auto-generated "Artist - Topic" channels upload bare song titles
+        topic = _TOPIC_CHANNEL.match(uploader or '')
+        if topic and not _SEPARATOR.search(title):
+            return self._result(self.clean_title(title), topic.group('artist'), 0.95)
+
+        had_noise = self.clean_title(title) != title
+        non_music = bool(_NON_MUSIC.search(title))
+
+        parts = [p for p in _SEPARATOR.split(self.clean_title(title)) if p.strip()]
+        if len(parts) == 2:
+            artist, song = parts
+            # "Artist ft. Other - Song": the featured credit belongs with the title
+            feat = _FEAT_INLINE.search(artist)
+            if feat:
+                artist = artist[:feat.start()]
+                song = f"{song} {feat.group(1)}"
+            confidence = 0.9
+            if had_noise:
+                confidence += 0.05
+            if len(artist) > 50 or len(artist.split()) > 6:
+                confidence -= 0.3
+            if _BY_WORD.search(song):
+                confidence = min(confidence, 0.5) # e.g. "Label - Song by Artist"
+            if non_music:
+                confidence = min(confidence, 0.3)
+            return self._result(self.clean_title(song), self.clean_title(artist), confidence)
+
+        if len(parts) > 2:
+            # "Artist - Song - Something": ambiguous, take the first split but leave it to the LLM
+            return self._result(self.clean_title(' - '.join(parts[1:])), self.clean_title(parts[0]), 0.4)
+
+        quoted = _QUOTED_TITLE.match(title)
+        if quoted:
+            return self._result(self.clean_title(quoted.group('title')), quoted.group('artist'), 0.8 if not non_music else 0.3)
+
+        by = _BY_SEPARATOR.match(self.clean_title(title))
+        if by:
+            return self._result(self.clean_title(by.group('title')), by.group('artist'), 0.6)
+
+        return self._result(self.clean_title(title), "Unknown", 0.1)
+
+    @staticmethod
+    def _result(title: str, artist: str, confidence: float) -> dict:
+        title = title.strip()
+        artist = _EDGE_JUNK.sub('', artist).strip()
+        if not title or not artist:
+            confidence = min(confidence, 0.1)
+        return {'title': title, 'artist': artist or "Unknown", 'confidence': round(max(0.0, min(confidence, 1.0)), 2)}
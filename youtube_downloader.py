@@ -1,57 +1,183 @@
-import yt_dlp
 import os
+import shutil
+import time
+import re
+from urllib.parse import urlparse, parse_qs
+
+from info_cache import InfoCache
+from metrics import metrics
+
+# Matches the 11-character video ID in watch, youtu.be, shorts, embed and live URLs
+_VIDEO_ID_PATTERN = re.compile(
+    r'(?:youtube(?:-nocookie)?\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/|v/)|youtu\.be/)([0-9A-Za-z_-]{11})'
+)
+
+# yt-dlp format selection and FFmpegExtractAudio settings per output mode.
+# FFmpegExtractAudio stream-copies when the source codec already matches, so 'm4a' on an AAC
+# stream and 'best' on anything are remuxes rather than re-encodes.
+AUDIO_FORMATS = {
+    'mp3': {
+        'format': 'bestaudio/best',
+        'postprocessor': {'key': 'FFmpegExtractAudio', 'preferredcodec': 'mp3', 'preferredquality': '192'},
+    },
+    'm4a': {
+        'format': 'bestaudio[ext=m4a]/bestaudio[acodec^=mp4a]/bestaudio/best',
+        'postprocessor': {'key': 'FFmpegExtractAudio', 'preferredcodec': 'm4a'},
+    },
+    'best': {
+        'format': 'bestaudio/best',
+        'postprocessor': {'key': 'FFmpegExtractAudio', 'preferredcodec': 'best'},
+    },
+}
+
+# Marks info dicts served from the info cache; yt-dlp ignores keys it doesn't know
+_FROM_INFO_CACHE = '_from_info_cache'
+
+# How YouTube answers requests for a stream URL that has expired
+_EXPIRED_URL_MESSAGES = ('http error 403', 'http error 410')
+
+PARTIAL_SUFFIX = '.partial' # Hidden, non-audio name for copies into an output directory on another filesystem
+
+
+def move_into_place(staged_path: str, final_path: str, same_filesystem: bool = True):
+    """
+    Replaces final_path with a finished staged file in one atomic rename. Across filesystems the file is
+    first copied next to final_path as a hidden '.partial' file, which Spotify doesn't load, and then renamed.
+    """
+    if same_filesystem:
+        os.replace(staged_path, final_path)
+        return
+    directory, name = os.path.split(final_path)
+    partial_path = os.path.join(directory, f".{name}{PARTIAL_SUFFIX}")
+    try:
+        shutil.copyfile(staged_path, partial_path)
+        os.replace(partial_path, final_path)
+    except OSError:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    os.remove(staged_path)
 
 class YouTubeDownloader:
-    def __init__(self, output_dir: str):
+    """
+    Downloads and converts audio into staging_dir (the output directory itself when not given).
+    Staged files are named '<title> [<video id>].<ext>' so different videos with the same title
+    never overwrite each other; publish() moves a finished file into the output directory.
+    """
+
+
+    def __init__(self, output_dir: str, info_cache: InfoCache = None, audio_format: str = 'mp3', quiet: bool = False,
+                 staging_dir: str = None):
+        if audio_format not in AUDIO_FORMATS:
+            raise ValueError(f"Unsupported audio format: {audio_format}. Choose one of {', '.join(AUDIO_FORMATS)}.")
         self.output_dir = output_dir
+        self.staging_dir = staging_dir if staging_dir else output_dir
+        self.info_cache = info_cache
+        self.audio_format = audio_format
+        self.quiet = quiet
         os.makedirs(output_dir, exist_ok=True)
+        os.makedirs(self.staging_dir, exist_ok=True)
+        self.same_filesystem = os.stat(self.staging_dir).st_dev == os.stat(output_dir).st_dev
+        if not self.same_filesystem:
+            print(f"Warning: The staging directory '{self.staging_dir}' is on a different filesystem than '{output_dir}', "
+                  f"so finished tracks can't simply be renamed into place. They are copied in under a hidden "
+                  f"'{PARTIAL_SUFFIX}' name first, then renamed. Point YT_SPOTIFY_CACHE_DIR at the output "
+                  f"directory's filesystem to avoid the copy.")
+
+    def _ydl_opts(self, postprocessor_hooks: list = None) -> dict:
+        audio_format = AUDIO_FORMATS[self.audio_format]
+        return {
+            'format': audio_format['format'],
+            'postprocessors': [dict(audio_format['postprocessor'])],
+            'outtmpl': os.path.join(self.staging_dir, '%(title)s [%(id)s].%(ext)s'),
+            'noplaylist': True,
+            'progress_hooks': [] if self.quiet else [self._download_progress_hook],
+            'postprocessor_hooks': postprocessor_hooks or [],
+            'quiet': self.quiet,
+            'noprogress': self.quiet,
+        }
 
     def download_audio(self, youtube_url: str) -> str:
         """
         Downloads audio from a YouTube URL and returns the path to the downloaded file.
         yt-dlp can handle conversion directly.
         """
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3', # or 'm4a'
-                'preferredquality': '192',
-            }],
-            'outtmpl': os.path.join(self.output_dir, '%(title)s.%(ext)s'),
-            'noplaylist': True,
-            'ignoreerrors': True, # To continue if some videos in a playlist fail
-            'progress_hooks': [self._download_progress_hook],
-            'quiet': False # Set to True for less verbose output
-        }
+        return self.download(youtube_url)['filepath']
 
+    def download(self, youtube_url: str) -> dict:
+        """
+        Extracts the video page once, downloads and converts the audio, and returns what the rest
+        of the pipeline needs: {'filepath', 'id', 'title', 'uploader', 'thumbnail_url', 'info'}.
+        'filepath' is the post-processed file in the staging directory, as reported by yt-dlp.
+        """
+        return self.download_from_info(self.extract_info(youtube_url))
+
+    def extract_info(self, youtube_url: str) -> dict:
+        """
+        Extracts the info dict for a video without downloading, using the info cache when available.
+        """
+        video_id = self.extract_video_id(youtube_url)
+        if self.info_cache and video_id:
+            cached = self.info_cache.get(video_id)
+            if cached:
+                print(f"Using cached video info for {video_id}")
+                metrics.record('extract', 0.0, cache_hit=True, video_id=video_id)
+                return dict(cached, **{_FROM_INFO_CACHE: True})
+
+        import yt_dlp # Deferred: yt-dlp takes a noticeable share of startup and cache hits don't need it
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info_dict = ydl.extract_info(youtube_url, download=True)
-                # yt-dlp renames the file after conversion, so we need to get the final path
-                # This might require inspecting the postprocessor output or using a simpler outtmpl and then renaming.
-                # A common pattern is to get the 'filepath' from the info_dict after postprocessing
-                # However, for 'FFmpegExtractAudio', the new filename is usually title.ext
-                # Let's simplify and rely on the outtmpl naming convention for the purpose of this example.
-                # The actual file will be <title>.mp3 after conversion.
-                original_filename = ydl.prepare_filename(info_dict)
-                final_filename_base = os.path.splitext(original_filename)[0]
-                final_audio_path = f"{final_filename_base}.mp3" # Assuming mp3 conversion
-
-                if not os.path.exists(final_audio_path):
-                     print(f"Warning: Expected file {final_audio_path} not found after download/conversion. yt-dlp might have named it differently or failed.")
-                     # Fallback: try to find any new .mp3 in the output_dir that matches part of the title
-                     for f in os.listdir(self.output_dir):
-                         if info_dict.get('title') and info_dict['title'].lower() in f.lower() and f.endswith('.mp3'):
-                             final_audio_path = os.path.join(self.output_dir, f)
-                             print(f"Found potentially matching file: {final_audio_path}")
-                             break
-                     if not os.path.exists(final_audio_path):
-                         raise FileNotFoundError(f"Could not locate the downloaded audio file for {youtube_url}")
+            with metrics.span('extract', cache_hit=False if self.info_cache else None, video_id=video_id), \
+                    yt_dlp.YoutubeDL(self._ydl_opts()) as ydl:
+                info_dict = ydl.extract_info(youtube_url, download=False)
+                if not info_dict:
+                    raise ValueError(f"Could not extract video info for {youtube_url}")
+                info_dict = ydl.sanitize_info(info_dict)
+        except yt_dlp.DownloadError as e:
+            print(f"Error extracting YouTube info: {e}")
+            raise
 
+        if self.info_cache:
+            self.info_cache.put(info_dict)
+        return info_dict
 
+    def download_from_info(self, info_dict: dict) -> dict:
+        """
+        Downloads and converts the audio described by an already extracted info dict.
+        The 'download' span covers fetching and converting; the conversion alone is also recorded
+        as a 'transcode' span from yt-dlp's postprocessor hooks.
+        """
+        import yt_dlp
+        try:
+            with metrics.span('download', video_id=info_dict.get('id')) as span, \
+                    yt_dlp.YoutubeDL(self._ydl_opts([self._transcode_timer()])) as ydl:
+                try:
+                    result = ydl.process_ie_result(dict(info_dict), download=True)
+                except yt_dlp.DownloadError as e:
+                    if not (self.info_cache and info_dict.get(_FROM_INFO_CACHE) and self._is_expired_url_error(e)):
+                        raise
+                    # The cached stream URLs have expired; extract fresh info and try once more
+                    print("Cached video info is stale, extracting again...")
+                    self.info_cache.remove(info_dict.get('id', ''))
+                    fresh_info = ydl.extract_info(info_dict['webpage_url'], download=False)
+                    if not fresh_info:
+                        raise
+                    self.info_cache.put(ydl.sanitize_info(fresh_info))
+                    result = ydl.process_ie_result(fresh_info, download=True)
+
+                final_audio_path = self._final_filepath(ydl, result)
+                if not final_audio_path or not os.path.exists(final_audio_path):
+                    raise FileNotFoundError(f"Could not locate the downloaded audio file for {info_dict.get('webpage_url')}")
+
+                span['bytes'] = os.path.getsize(final_audio_path)
                 print(f"Downloaded and converted audio to: {final_audio_path}")
-                return final_audio_path
+                return {
+                    'filepath': final_audio_path,
+                    'id': result.get('id'),
+                    'title': result.get('title'),
+                    'uploader': result.get('channel') or result.get('uploader'),
+                    'thumbnail_url': self.select_thumbnail_url(result),
+                    'info': result,
+                }
         except yt_dlp.DownloadError as e:
             print(f"Error downloading YouTube video: {e}")
             raise
@@ -59,6 +185,149 @@ class YouTubeDownloader:
             print(f"An unexpected error occurred during download: {e}")
             raise
 
+    def publish(self, staged_path: str) -> str:
+        """
+        Moves a finished (converted and tagged) file from the staging directory into the output
+        directory with one atomic rename, so Spotify's scanner never sees a partial or untagged file.
+        Across filesystems the file is first copied next to its final name as a hidden '.partial' file,
+        which Spotify doesn't load, and then renamed. Returns the final path.
+        """
+        final_path = os.path.join(self.output_dir, os.path.basename(staged_path))
+        if os.path.abspath(staged_path) != os.path.abspath(final_path):
+            move_into_place(staged_path, final_path, self.same_filesystem)
+        return final_path
+
+    def prune_staging(self, max_age_seconds: float) -> int:
+        """
+        Deletes staged files (including yt-dlp's partial downloads) not modified within max_age_seconds,
+        and '.partial' copies an interrupted cross-filesystem publish left in the output directory.
+        Staged files are left alone when staging happens in the output directory itself. Returns the number removed.
+        """
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        stale = [entry for entry in os.scandir(self.output_dir)
+                 if entry.name.startswith('.') and entry.name.endswith(PARTIAL_SUFFIX)]
+        if os.path.abspath(self.staging_dir) != os.path.abspath(self.output_dir):
+            stale.extend(os.scandir(self.staging_dir))
+        for entry in stale:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                pass # Another process may have published or removed it
+        return removed
+
+    @staticmethod
+    def _is_expired_url_error(exc: BaseException) -> bool:
+        """
+        True if a download failed because the stream URL was refused (HTTP 403/410), which is how
+        expired URLs from cached info fail. Looks at yt-dlp's wrapped original error too.
+        """
+        wrapped = getattr(exc, 'exc_info', None)
+        for error in (exc, wrapped[1] if isinstance(wrapped, tuple) and len(wrapped) > 1 else None):
+            if error is None:
+                continue
+            status = getattr(error, 'status', None) or getattr(error, 'code', None)
+            if status in (403, 410) or any(message in str(error).lower() for message in _EXPIRED_URL_MESSAGES):
+                return True
+        return False
+
+    @staticmethod
+    def _final_filepath(ydl, info_dict: dict) -> str | None:
+        """
+        yt-dlp records the post-processed path (after FFmpegExtractAudio renames the file)
+        in each entry of 'requested_downloads'.
+        """
+        for download in reversed(info_dict.get('requested_downloads') or []):
+            if download.get('filepath'):
+                return download['filepath']
+        if info_dict.get('filepath'):
+            return info_dict['filepath']
+        return None
+
+    @staticmethod
+    def extract_video_id(youtube_url: str) -> str | None:
+        """
+        Returns the YouTube video ID from a URL without any network access, or None if it has none.
+        """
+        match = _VIDEO_ID_PATTERN.search(youtube_url)
+        return match.group(1) if match else None
+
+    @staticmethod
+    def select_thumbnail_url(info_dict: dict) -> str | None:
+        """
+        Picks the largest thumbnail listed in an info dict.
+        """
+        thumbnails = info_dict.get('thumbnails') or []
+        if thumbnails:
+            largest_thumbnail = max(thumbnails, key=lambda x: (x.get('width') or 0) * (x.get('height') or 0))
+            return largest_thumbnail.get('url')
+        return info_dict.get('thumbnail')
+
+    @staticmethod
+    def is_playlist_url(youtube_url: str) -> bool:
+        """
+        Returns True if the URL points at a playlist rather than a single video.
+        A watch URL carrying both 'v' and 'list' is treated as a single video, matching 'noplaylist'.
+        """
+        parsed = urlparse(youtube_url)
+        query = parse_qs(parsed.query)
+        if parsed.path.rstrip('/').endswith('/playlist'):
+            return True
+        return 'list' in query and 'v' not in query
+
+    def enumerate_playlist(self, playlist_url: str) -> list[dict]:
+        """
+        Lists the videos in a playlist using flat extraction (no per-video page fetches).
+        Returns a list of {'url': ..., 'title': ...} dicts in playlist order.
+        """
+        import yt_dlp
+        ydl_opts = {
+            'quiet': True,
+            'extract_flat': 'in_playlist',
+            'ignoreerrors': True,
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info_dict = ydl.extract_info(playlist_url, download=False)
+
+        if not info_dict:
+            raise ValueError(f"Could not enumerate playlist: {playlist_url}")
+
+        entries = []
+        for entry in info_dict.get('entries') or []:
+            if not entry:
+                continue # Unavailable/private videos come back as None
+            url = entry.get('url') or entry.get('webpage_url')
+            if not url:
+                continue
+            if not url.startswith('http') and entry.get('id'):
+                url = f"https://www.youtube.com/watch?v={entry['id']}"
+            entries.append({'url': url, 'title': entry.get('title')})
+        print(f"Playlist '{info_dict.get('title', playlist_url)}' contains {len(entries)} videos.")
+        return entries
+
+    @staticmethod
+    def _transcode_timer():
+        """
+        Returns a yt-dlp postprocessor hook that records each postprocessor run as a 'transcode' span.
+        """
+        started = {}
+
+        def hook(d):
+            name = d.get('postprocessor')
+            if name == 'MoveFiles': # Just moves the finished file into place
+                return
+            if d['status'] == 'started':
+                started[name] = (time.time(), time.perf_counter())
+            elif d['status'] == 'finished' and name in started:
+                started_at, start = started.pop(name)
+                filepath = (d.get('info_dict') or {}).get('filepath')
+                size = os.path.getsize(filepath) if filepath and os.path.exists(filepath) else None
+                metrics.record('transcode', time.perf_counter() - start, started_at=started_at,
+                               postprocessor=name, bytes=size)
+        return hook
+
     def _download_progress_hook(self, d):
         if d['status'] == 'downloading':
             print(f"Downloading: {d['_percent_str']} of {d['_total_bytes_str']} at {d['_speed_str']}")